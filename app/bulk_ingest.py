@@ -0,0 +1,223 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import zipfile
+
+import pandas as pd
+
+from app.matching import load_students, build_lookup
+from app.class_summary import (
+    EVENT_REQUIRED_COLUMNS,
+    generate_attendance_log_from_df,
+    save_attendance_log,
+)
+from app.ingest_journal import JOURNAL
+from app.upload_registry import (
+    load_registry,
+    content_hash,
+    find_upload,
+    record_upload,
+)
+
+# per-worker student index, set by _init_worker
+_LOOKUPS = None
+
+# the server process already runs threads (journal committer, request
+# threadpool), which fork() would copy mid-state; start workers from a
+# clean process instead (spawn where forkserver is unavailable)
+_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+def expand_inputs(files: list[tuple[str, bytes]]) -> list[tuple[str, bytes]]:
+    """
+    Turn (filename, bytes) inputs into a flat list of CSVs,
+    unpacking any .zip archives. Non-CSV archive members are ignored.
+    """
+    csvs = []
+    for filename, content in files:
+        lower = filename.lower()
+        if lower.endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(content)) as zf:
+                for member in zf.infolist():
+                    if member.is_dir() or not member.filename.lower().endswith(".csv"):
+                        continue
+                    csvs.append((f"{filename}:{member.filename}", zf.read(member)))
+        elif lower.endswith(".csv"):
+            csvs.append((filename, content))
+        else:
+            raise ValueError(f"Unsupported file type: {filename} (expected .csv or .zip)")
+    return csvs
+
+
+def _init_worker(students_df: pd.DataFrame) -> None:
+    global _LOOKUPS
+    _LOOKUPS = build_lookup(students_df)
+
+
+def _process_csv(filename: str, content: bytes) -> dict:
+    """
+    Parse + match one CSV. Runs inside a pool worker.
+    """
+    try:
+        events_df = pd.read_csv(io.BytesIO(content))
+    except Exception as e:
+        return {"filename": filename, "error": f"Invalid CSV: {e}"}
+
+    events_df.columns = [c.strip().lower() for c in events_df.columns]
+    missing = EVENT_REQUIRED_COLUMNS - set(events_df.columns)
+    if missing:
+        return {
+            "filename": filename,
+            "error": f"Missing required columns in CSV: {', '.join(sorted(missing))}",
+        }
+
+    attendance_df = generate_attendance_log_from_df(events_df, lookups=_LOOKUPS)
+    return {
+        "filename": filename,
+        "row_count": int(len(events_df)),
+        "log": attendance_df,
+    }
+
+
+def ingest_files(files: list[tuple[str, bytes]], max_workers: int | None = None) -> dict:
+    """
+    Ingest many events CSVs / zip archives in one pass.
+
+    Parsing, normalization, fingerprinting and matching run per file in a
+    process pool; each worker builds the same read-only student index once.
+    Results are de-duplicated across all files and saved in a single write.
+
+    Files already in the upload registry (same bytes) are skipped.
+    Per-file parse / column errors are reported and don't stop the batch.
+    """
+    csvs = expand_inputs(files)
+
+    registry = load_registry()
+    # one slot per input file, so the report follows the input order
+    results: list[dict | None] = [None] * len(csvs)
+    pending = []
+    slots = []
+    seen_hashes = set()
+    for slot, (filename, content) in enumerate(csvs):
+        cached = find_upload(registry, content)
+        if cached is not None:
+            results[slot] = {"filename": filename, **cached["summary"], "cached": True}
+            continue
+        # the same export twice in one batch only needs one pass
+        digest = content_hash(content)
+        if digest in seen_hashes:
+            results[slot] = {"filename": filename, "rows": 0, "matched_count": 0,
+                             "unmatched_count": 0, "duplicate_in_batch": True}
+            continue
+        seen_hashes.add(digest)
+        pending.append((filename, content))
+        slots.append(slot)
+
+    students_df = load_students()
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(pending)))
+
+    if max_workers == 1:
+        _init_worker(students_df)
+        processed = [_process_csv(name, content) for name, content in pending]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context(_START_METHOD),
+            initializer=_init_worker,
+            initargs=(students_df,),
+        ) as pool:
+            processed = list(
+                pool.map(
+                    _process_csv,
+                    [name for name, _ in pending],
+                    [content for _, content in pending],
+                )
+            )
+
+    frames = []
+    for slot, item in zip(slots, processed):
+        if "error" in item:
+            results[slot] = {"filename": item["filename"], "error": item["error"]}
+            continue
+
+        log_df = item["log"]
+        if log_df.empty:
+            summary = {"rows": 0, "matched_count": 0, "unmatched_count": 0}
+            fingerprints = []
+        else:
+            matched = log_df["matched"].astype(bool)
+            summary = {
+                "rows": int(len(log_df)),
+                "matched_count": int(matched.sum()),
+                "unmatched_count": int((~matched).sum()),
+            }
+            fingerprints = log_df["fingerprint_hash"].tolist()
+            frames.append(log_df)
+
+        item["summary"] = summary
+        item["fingerprints"] = fingerprints
+        results[slot] = {"filename": item["filename"], **summary, "cached": False}
+
+    added = 0
+    if frames:
+        combined = pd.concat(frames, ignore_index=True)
+        # global de-dup across every file of the batch, then one write
+        combined = combined.drop_duplicates(subset=["fingerprint_hash"])
+        added = int(len(save_attendance_log(combined)))
+
+    # register only after the log write succeeded
+    for (_, content), item in zip(pending, processed):
+        if "error" in item:
+            continue
+        record_upload(
+            content,
+            item["filename"],
+            row_count=item["row_count"],
+            summary=item["summary"],
+            fingerprints=item["fingerprints"],
+        )
+
+    ok = [r for r in results if "error" not in r]
+    return {
+        "files": results,
+        "files_processed": sum(1 for r in ok if r.get("cached") is False),
+        "files_cached": sum(1 for r in ok if r.get("cached")),
+        "files_failed": len(results) - len(ok),
+        "rows": sum(r["rows"] for r in ok),
+        "matched_count": sum(r["matched_count"] for r in ok),
+        "unmatched_count": sum(r["unmatched_count"] for r in ok),
+        "rows_added": added,
+        "workers": max_workers if pending else 0,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    CLI entry point (run from the project root):
+
+        python -m app.bulk_ingest drives/*.csv exports.zip --workers 8
+    """
+    parser = argparse.ArgumentParser(
+        description="Ingest many events CSVs / zip archives into the attendance log."
+    )
+    parser.add_argument("paths", nargs="+", help=".csv or .zip files")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    files = [(Path(p).name, Path(p).read_bytes()) for p in args.paths]
+    result = ingest_files(files, max_workers=args.workers)
+    # no background committer in the CLI: fold the journal in before exiting
+    JOURNAL.commit()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
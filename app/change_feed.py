@@ -0,0 +1,180 @@
+from collections import deque
+import asyncio
+import json
+import threading
+import uuid
+
+import pandas as pd
+
+# changes since this process started; clients seeing a new epoch must
+# refetch. Everything below is per process: with several workers each
+# has its own epoch, sequence and class versions.
+EPOCH = str(uuid.uuid4())
+
+# recent events kept for Last-Event-ID replay on reconnect
+HISTORY_SIZE = 1000
+# unmatched rows sent inline with an "attendance_added" event
+MAX_INLINE_ROWS = 500
+# seconds between keep-alive comments on an idle stream
+KEEPALIVE_SECONDS = 15
+
+_lock = threading.Lock()
+_seq = 0
+_history: deque = deque(maxlen=HISTORY_SIZE)
+_class_versions: dict[str, int] = {}
+# subscriber queue -> the event loop it belongs to
+_subscribers: dict[asyncio.Queue, asyncio.AbstractEventLoop] = {}
+
+
+def get_class_version(class_id: str) -> int:
+    with _lock:
+        return _class_versions.get(str(class_id).strip(), 0)
+
+
+def _bump_classes(class_ids) -> dict[str, int]:
+    # caller holds _lock
+    versions = {}
+    for cid in class_ids:
+        if cid is None or pd.isna(cid):
+            continue
+        cid = str(cid).strip()
+        if not cid:
+            continue
+        _class_versions[cid] = _class_versions.get(cid, 0) + 1
+        versions[cid] = _class_versions[cid]
+    return versions
+
+
+def publish(kind: str, data: dict, class_ids=()) -> dict:
+    """
+    Record a change, bump the version of every affected class and
+    push the event to all connected streams. Safe to call from any thread.
+    """
+    global _seq
+    with _lock:
+        _seq += 1
+        event = {
+            "id": _seq,
+            "event": kind,
+            "data": {
+                **data,
+                "epoch": EPOCH,
+                "class_versions": _bump_classes(set(class_ids)),
+            },
+        }
+        _history.append(event)
+        subscribers = list(_subscribers.items())
+
+    for queue, loop in subscribers:
+        try:
+            loop.call_soon_threadsafe(_deliver, queue, event)
+        except RuntimeError:
+            # loop already closed; the stream is gone
+            with _lock:
+                _subscribers.pop(queue, None)
+    return event
+
+
+def _deliver(queue: asyncio.Queue, event: dict) -> None:
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # a client this far behind gets dropped and replays on reconnect;
+        # make room for the None that ends its stream
+        with _lock:
+            _subscribers.pop(queue, None)
+        queue.get_nowait()
+        queue.put_nowait(None)
+
+
+def _json_rows(df: pd.DataFrame) -> list[dict]:
+    df = df.astype(object)
+    df = df.where(pd.notnull(df), None)
+    return json.loads(df.to_json(orient="records", date_format="iso"))
+
+
+def publish_rows_added(added: pd.DataFrame) -> None:
+    """
+    New attendance rows were appended to the log. Unmatched ones are sent
+    inline (up to MAX_INLINE_ROWS) so review queues can apply them directly.
+    """
+    if added is None or added.empty:
+        return
+
+    if "matched" in added.columns:
+        unmatched = added[~added["matched"].astype(bool)]
+    else:
+        unmatched = added.iloc[0:0]
+
+    data = {
+        "rows": int(len(added)),
+        "unmatched_count": int(len(unmatched)),
+        "unmatched_truncated": bool(len(unmatched) > MAX_INLINE_ROWS),
+        "unmatched_rows": _json_rows(unmatched.head(MAX_INLINE_ROWS)),
+    }
+    class_ids = added["class_id"].tolist() if "class_id" in added.columns else []
+    publish("attendance_added", data, class_ids)
+
+
+def publish_row_resolved(row: dict, old_class_id=None) -> None:
+    publish(
+        "attendance_resolved",
+        {"attendance_id": row.get("attendance_id"), "row": row},
+        [old_class_id, row.get("class_id")],
+    )
+
+
+def publish_rows_rematched(count: int, class_ids) -> None:
+    publish("attendance_rematched", {"rows": int(count)}, class_ids)
+
+
+def _format(event: dict) -> str:
+    payload = json.dumps(event["data"], default=str)
+    id_line = f"id: {event['id']}\n" if event.get("id") is not None else ""
+    return f"{id_line}event: {event['event']}\ndata: {payload}\n\n"
+
+
+async def stream_events(last_event_id: str | None = None):
+    """
+    Async generator of text/event-stream chunks.
+
+    On reconnect the browser sends Last-Event-ID; events still in the
+    history are replayed, otherwise a "reset" tells the client to refetch.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=HISTORY_SIZE)
+    loop = asyncio.get_running_loop()
+
+    with _lock:
+        _subscribers[queue] = loop
+        backlog = []
+        if last_event_id:
+            try:
+                last = int(last_event_id)
+            except ValueError:
+                last = None
+            oldest = _history[0]["id"] if _history else _seq + 1
+            if last is None or last + 1 < oldest:
+                backlog.append({"id": _seq, "event": "reset", "data": {"epoch": EPOCH}})
+            else:
+                backlog.extend(e for e in _history if e["id"] > last)
+        current = {"id": None, "event": "hello", "data": {"epoch": EPOCH, "seq": _seq}}
+
+    try:
+        yield "retry: 3000\n\n"
+        yield _format(current)
+        for event in backlog:
+            yield _format(event)
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                # dropped for falling behind
+                return
+            yield _format(event)
+    finally:
+        with _lock:
+            _subscribers.pop(queue, None)
@@ -1,4 +1,5 @@
 from pathlib import Path
+import logging
 import uuid
 import pandas as pd
 
@@ -8,7 +9,13 @@ from app.matching import (
     build_lookup,
     match_student,
     make_fingerprint,
+    identity_str,
 )
+from app.trends import update_rollups, refresh_rollups, rebuild_rollups
+from app.companies import update_company_stats, refresh_company_stats, rebuild_company_stats
+from app.log_query import attendance_log
+from app.change_feed import publish_rows_added, publish_row_resolved
+from app.ingest_journal import JOURNAL
 
 # Base dir = project root (place_modle)
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -17,16 +24,38 @@ DATA_DIR.mkdir(exist_ok=True)
 
 LOG_PATH = DATA_DIR / "attendance_log.csv"
 
+# identity as given in the upload, kept so rows can be re-matched
+# when the students master changes
+INPUT_COLUMNS = ["input_student_id", "input_name", "input_email", "input_phone"]
 
+logger = logging.getLogger(__name__)
 
 
-def generate_attendance_log_from_df(events_df: pd.DataFrame) -> pd.DataFrame:
+
+
+# columns an uploaded events CSV must have (after lower-casing)
+EVENT_REQUIRED_COLUMNS = {
+    "student_id",
+    "name",
+    "email",
+    "company_or_organizer",
+    "event_type",
+    "event_date",
+    "result",
+}
+
+
+def generate_attendance_log_from_df(events_df: pd.DataFrame, lookups=None) -> pd.DataFrame:
     """
     Build an attendance log DataFrame from a given events DataFrame.
     Used both for the default CSV and for uploaded CSVs.
+
+    `lookups` is a prebuilt build_lookup() tuple; bulk ingest passes one
+    shared index instead of re-reading the master per file.
     """
-    students_df = load_students()
-    lookup_id, lookup_email, lookup_phone, lookup_name = build_lookup(students_df)
+    if lookups is None:
+        lookups = build_lookup(load_students())
+    lookup_id, lookup_email, lookup_phone, lookup_name = lookups
 
     logs = []
     fingerprints = set()
@@ -52,13 +81,39 @@ def generate_attendance_log_from_df(events_df: pd.DataFrame) -> pd.DataFrame:
                 "company": row.get("company_or_organizer"),
                 "result": row.get("result"),
                 "lpa": row.get("lpa"),
+                "event_date": row.get("event_date"),
+                "attendance_status": row.get("attendance_status"),
+                # identity as given in the upload, kept so rows can be
+                # re-matched when the students master changes
+                "input_student_id": identity_str(row.get("student_id")),
+                "input_name": identity_str(row.get("name")),
+                "input_email": identity_str(row.get("email")),
+                "input_phone": identity_str(row.get("phone")),
                 "matched": (status != "UNMATCHED"),
                 "match_status": status,
                 "match_score": score,
             }
         )
 
-    return pd.DataFrame(logs)
+    log_df = pd.DataFrame(logs)
+    if not log_df.empty:
+        log_df = parse_log_types(log_df)
+    return log_df
+
+
+def parse_log_types(log_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Coerce typed columns of the attendance log.
+    event_date becomes datetime64 (unparseable / missing dates -> NaT);
+    input_* identity columns stay text even when the CSV read them as
+    float (a phone column with blanks).
+    """
+    if "event_date" in log_df.columns:
+        log_df["event_date"] = pd.to_datetime(log_df["event_date"], errors="coerce")
+    for col in INPUT_COLUMNS:
+        if col in log_df.columns:
+            log_df[col] = log_df[col].astype(object).map(identity_str).astype(object)
+    return log_df
 
 
 def generate_attendance_log() -> pd.DataFrame:
@@ -70,36 +125,115 @@ def generate_attendance_log() -> pd.DataFrame:
     return generate_attendance_log_from_df(events_df)
 
 
-def save_attendance_log(new_log_df: pd.DataFrame) -> None:
+def save_attendance_log(new_log_df: pd.DataFrame) -> pd.DataFrame:
     """
-    Append new attendance rows into data/attendance_log.csv,
-    de-duplicating by fingerprint_hash if present.
+    Append new attendance rows to the log through the ingest journal,
+    de-duplicating by fingerprint_hash. The rows are durable (and
+    visible to reads) on return; the journal group-commits them into
+    data/attendance_log.csv later.
+    Returns only the rows that were actually added, and folds
+    them into the trend rollups and company stats.
     """
     if new_log_df is None or new_log_df.empty:
+        return pd.DataFrame()
+
+    # journal + derived stores under one lock, so concurrent writers
+    # (threads or a bulk run) never interleave their read-modify-writes
+    with JOURNAL.locked():
+        # an earlier writer's update failed: the marker below must not
+        # hide it, so rebuild instead of folding this batch in
+        stale = JOURNAL.underived_entries()
+        added = JOURNAL.append(parse_log_types(new_log_df.copy()))
+        try:
+            if stale:
+                rebuild_derived_stores(JOURNAL.view())
+            else:
+                update_rollups(added)
+                update_company_stats(added)
+            JOURNAL.mark_derived()
+        except Exception:
+            # the rows are durable; the next commit rebuilds the stores
+            logger.exception("derived store update failed after appending %d rows", len(added))
+
+    publish_rows_added(added)
+    JOURNAL.maybe_commit()
+    return added
+
+def update_attendance_rows(rows_df: pd.DataFrame) -> None:
+    """
+    Journal edited log rows (full rows, matched by attendance_id)
+    and refresh the trend buckets / company stats they touch.
+    """
+    if rows_df is None or rows_df.empty:
+        return
+
+    with JOURNAL.locked():
+        stale = JOURNAL.underived_entries()
+        current = JOURNAL.view()
+        if "attendance_id" in current.columns and "attendance_id" in rows_df.columns:
+            ids = set(rows_df["attendance_id"].astype(str))
+            before = current[current["attendance_id"].astype(str).isin(ids)]
+        else:
+            before = current.iloc[0:0]
+        JOURNAL.update(rows_df)
+
+        try:
+            log_df = JOURNAL.view()
+            if stale:
+                rebuild_derived_stores(log_df)
+            else:
+                changed = pd.concat([before, rows_df], ignore_index=True)
+                refresh_rollups(log_df, changed)
+                refresh_company_stats(log_df, changed)
+            JOURNAL.mark_derived()
+        except Exception:
+            logger.exception("derived store update failed after editing %d rows", len(rows_df))
+
+    JOURNAL.maybe_commit()
+
+
+def rebuild_derived_stores(log_df: pd.DataFrame) -> None:
+    """
+    Rebuild the trend rollups and company stats from the full log.
+    Called by the journal (under its lock) after a replay, or when a
+    writer journaled rows without updating them.
+    """
+    rebuild_rollups(log_df)
+    rebuild_company_stats(log_df)
+
+def write_attendance_log(log_df: pd.DataFrame) -> None:
+    """
+    Store an edited copy of the whole log (e.g. after re-matching):
+    only the rows that differ from the current log are journaled.
+    """
+    current = JOURNAL.view()
+    if current.empty or "attendance_id" not in log_df.columns:
+        update_attendance_rows(log_df)
         return
 
-    if LOG_PATH.exists():
-        old_df = pd.read_csv(LOG_PATH)
-        combined = pd.concat([old_df, new_log_df], ignore_index=True)
-    else:
-        combined = new_log_df.copy()
+    columns = list(log_df.columns)
+    before = current.set_index(current["attendance_id"].astype(str)).reindex(
+        columns=columns
+    )
+    after = log_df.set_index(log_df["attendance_id"].astype(str))
+    before = before.reindex(after.index)
 
-    if "fingerprint_hash" in combined.columns:
-        combined = combined.drop_duplicates(subset=["fingerprint_hash"])
-    else:
-        combined = combined.drop_duplicates()
+    after_text = after.astype(object).astype(str)
+    before_text = before.astype(object).astype(str)
+    changed = (
+        (after_text != before_text) & ~(after_text.isna() & before_text.isna())
+    ).any(axis=1)
+    update_attendance_rows(log_df[changed.to_numpy()])
 
-    combined.to_csv(LOG_PATH, index=False)
 
 def load_attendance_log() -> pd.DataFrame:
     """
-    Load the persistent attendance log.
+    Load the persistent attendance log (committed rows plus the
+    journal overlay), as a copy the caller may edit.
     If it doesn't exist yet, bootstrap it from event_upload.csv.
     """
-    if LOG_PATH.exists():
-        df = pd.read_csv(LOG_PATH)
-        df.columns = [c.strip().lower() for c in df.columns]
-        return df
+    if JOURNAL.has_data():
+        return JOURNAL.view().copy()
 
     # bootstrap from the default CSV once
     base_log = generate_attendance_log()
@@ -110,57 +244,47 @@ def load_attendance_log() -> pd.DataFrame:
 
 
 
+def load_log_rows_by_fingerprint(fingerprints: list[str]) -> list[dict]:
+    """
+    Current log rows for the given fingerprint hashes, JSON-safe.
+    """
+    log_df = load_attendance_log()
+    if log_df is None or log_df.empty or "fingerprint_hash" not in log_df.columns:
+        return []
+
+    rows = log_df[log_df["fingerprint_hash"].isin(set(fingerprints))]
+    rows = rows.astype(object)
+    rows = rows.where(pd.notnull(rows), None)
+    return rows.to_dict(orient="records")
+
+
 def get_class_summary(class_id: str):
-    log = load_attendance_log()
     students_df = load_students()
 
     # total students in this class from master
     total = students_df[students_df["class_id"] == class_id].shape[0]
 
-    placed_unique = internship_unique = training_unique = 0
-    avg_lpa_placed = None
-    company_breakdown = {}
-
-    if log is not None and not log.empty:
-        data = log[log["class_id"] == class_id]
-
-        if not data.empty:
-            etype = data["event_type"].astype(str).str.lower()
-            result = data["result"].astype(str).str.lower()
-
-            placed = data[(etype == "placement") & (result == "selected")]
-            internship = data[(etype == "internship") & (result == "selected")]
-            training = data[(etype == "training")]
-
-            placed_unique = placed["student_id"].nunique()
-            internship_unique = internship["student_id"].nunique()
-            training_unique = training["student_id"].nunique()
-
-            # ---- Avg LPA of placed ----
-            if "lpa" in placed.columns:
-                try:
-                    lpa_series = pd.to_numeric(placed["lpa"], errors="coerce")
-                    if lpa_series.notna().any():
-                        avg_lpa_placed = float(lpa_series.mean())
-                    else:
-                        avg_lpa_placed = None
-                except Exception:
-                    avg_lpa_placed = None
-
-            # ---- Company-wise breakdown (unique placed students per company) ----
-            if "company" in placed.columns and "student_id" in placed.columns:
-                company_counts = (
-                    placed.assign(
-                        company=placed["company"].astype(str).str.strip()
-                    )
-                    .groupby("company")["student_id"]
-                    .nunique()
-                    .to_dict()
-                )
-                # remove empty company keys like ""
-                company_breakdown = {
-                    k: int(v) for k, v in company_counts.items() if k
-                }
+    data = attendance_log().where(class_id=class_id)
+    placed = data.where(event_type_norm="placement", result_norm="selected")
+    internship = data.where(event_type_norm="internship", result_norm="selected")
+    training = data.where(event_type_norm="training")
+
+    placed_stats = placed.agg(
+        students=("student_id", "nunique"),
+        avg_lpa=("lpa_num", "mean"),
+    )
+    placed_unique = placed_stats["students"] or 0
+    internship_unique = internship.agg(students=("student_id", "nunique"))["students"] or 0
+    training_unique = training.agg(students=("student_id", "nunique"))["students"] or 0
+    avg_lpa_placed = placed_stats["avg_lpa"]
+
+    # ---- Company-wise breakdown (unique placed students per company) ----
+    company_breakdown = {
+        company: int(stats["students"])
+        for company, stats in placed.group_by("company_norm")
+        .agg(students=("student_id", "nunique"))
+        .items()
+    }
 
     summary = {
         "class_id": class_id,
@@ -178,7 +302,7 @@ def get_class_summary(class_id: str):
 def resolve_match(attendance_id: str, new_student_id: str) -> dict:
     """
     Manually resolve an unmatched (or wrong) row by assigning a student_id.
-    Updates attendance_log.csv and returns the updated row as dict.
+    Journals the updated row and returns it as dict.
     """
     log_df = load_attendance_log()
     if log_df is None or log_df.empty:
@@ -202,15 +326,20 @@ def resolve_match(attendance_id: str, new_student_id: str) -> dict:
 
     # Update the row
     idx = log_df[mask].index[0]
+    old_class_id = log_df.at[idx, "class_id"]
     log_df.at[idx, "student_id"] = str(student_row["student_id"])
     log_df.at[idx, "class_id"] = student_row["class_id"]
     log_df.at[idx, "matched"] = True
     log_df.at[idx, "match_status"] = "MANUAL"
     log_df.at[idx, "match_score"] = 100
 
-    # Save back to CSV
-    log_df.to_csv(LOG_PATH, index=False)
+    # Save through the journal
+    update_attendance_rows(log_df.loc[[idx]])
 
     # Return updated row as dict
     updated_row = log_df.loc[idx].to_dict()
+    publish_row_resolved(
+        {k: (None if pd.isna(v) else v) for k, v in updated_row.items()},
+        old_class_id,
+    )
     return updated_row
@@ -0,0 +1,447 @@
+from pathlib import Path
+import math
+import re
+
+import pandas as pd
+
+from app.ingest_journal import JOURNAL, atomic_write_csv
+
+# Base dir = project root (place_modle)
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+DATA_DIR.mkdir(exist_ok=True)
+
+# optional, editable: alias,company (one alias per row)
+ALIASES_PATH = DATA_DIR / "company_aliases.csv"
+STATS_PATH = DATA_DIR / "company_stats.csv"
+
+# canonical name -> spellings seen in uploads
+# (extended / overridden by data/company_aliases.csv)
+DEFAULT_ALIASES = {
+    "Tata Consultancy Services": ["TCS", "Tata Consultancy"],
+    "Infosys": ["Infosys Technologies", "Infy"],
+    "Wipro": ["Wipro Technologies"],
+    "HCLTech": ["HCL", "HCL Technologies"],
+    "Cognizant": ["CTS", "Cognizant Technology Solutions"],
+    "Tech Mahindra": ["TechM"],
+    "Capgemini": ["Cap Gemini"],
+    "IBM": ["International Business Machines"],
+    "LTIMindtree": ["LTI", "Mindtree", "Larsen & Toubro Infotech"],
+    "Amazon": ["Amazon India", "Amazon Development Centre"],
+    "Google": ["Google India"],
+    "Microsoft": ["Microsoft India", "MSFT"],
+}
+
+# legal-form words dropped from the end of a name before matching
+_SUFFIXES = {"ltd", "limited", "pvt", "private", "inc", "llp", "llc", "corp", "corporation", "co"}
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+# LPA histogram: (column, lower bound inclusive, upper bound exclusive)
+LPA_BUCKETS = [
+    ("lpa_0_4", 0, 4),
+    ("lpa_4_6", 4, 6),
+    ("lpa_6_10", 6, 10),
+    ("lpa_10_20", 10, 20),
+    ("lpa_20_plus", 20, math.inf),
+]
+
+STATS_KEYS = ["company_id", "year", "class_id"]
+SUM_COLUMNS = ["events", "placement_events", "offers", "lpa_sum", "lpa_count"] + [
+    col for col, _, _ in LPA_BUCKETS
+]
+STATS_COLUMNS = STATS_KEYS + ["company"] + SUM_COLUMNS + ["lpa_min", "lpa_max"]
+
+# alias table + per-spelling results, reloaded when the alias file changes
+_ALIAS_CACHE = {"version": None, "aliases": None, "spellings": {}, "resolved": {}}
+# in-memory copy of the stats file: (mtime, DataFrame)
+_STATS_CACHE: dict[str, tuple[float, pd.DataFrame]] = {}
+
+
+# ========= COMPANY DIMENSION =========
+def company_key(name) -> str:
+    """
+    Matching key of a company name:
+    "Tata Consultancy Services Pvt. Ltd." -> "tata consultancy services"
+    """
+    if name is None or pd.isna(name):
+        return ""
+    text = str(name).lower().replace("&", " and ")
+    words = [w for w in _NON_WORD_RE.split(text) if w]
+    while len(words) > 1 and words[-1] in _SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def _slug(key: str) -> str:
+    return key.replace(" ", "-")
+
+
+def _aliases_mtime() -> float | None:
+    try:
+        return ALIASES_PATH.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def aliases_version():
+    """
+    Changes whenever data/company_aliases.csv does (None without one).
+    """
+    try:
+        stat = ALIASES_PATH.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def load_aliases() -> dict[str, str]:
+    """
+    company key -> canonical name, from DEFAULT_ALIASES plus
+    data/company_aliases.csv (columns: alias, company).
+    """
+    version = aliases_version()
+    if _ALIAS_CACHE["aliases"] is not None and _ALIAS_CACHE["version"] == version:
+        return _ALIAS_CACHE["aliases"]
+
+    aliases = {}
+    spellings = {}
+
+    def add(alias, canonical):
+        aliases[company_key(alias)] = canonical
+        if alias != canonical:
+            spellings.setdefault(canonical, set()).add(alias)
+
+    for canonical, names in DEFAULT_ALIASES.items():
+        add(canonical, canonical)
+        for alias in names:
+            add(alias, canonical)
+
+    if version is not None:
+        df = pd.read_csv(ALIASES_PATH, dtype=str)
+        df.columns = [c.strip().lower() for c in df.columns]
+        if {"alias", "company"} <= set(df.columns):
+            for alias, canonical in zip(df["alias"], df["company"]):
+                if pd.isna(alias) or pd.isna(canonical) or not str(canonical).strip():
+                    continue
+                canonical = str(canonical).strip()
+                add(canonical, canonical)
+                add(str(alias).strip(), canonical)
+
+    _ALIAS_CACHE.update(version=version, aliases=aliases, spellings=spellings, resolved={})
+    return aliases
+
+
+def canonical_company(name) -> tuple[str, str] | None:
+    """
+    (company_id, display name) for a raw company string, or None if blank.
+    Known aliases map to their canonical company; other names are
+    grouped by their matching key and keep their own spelling.
+    """
+    aliases = load_aliases()
+    resolved = _ALIAS_CACHE["resolved"]
+    if name in resolved:
+        return resolved[name]
+
+    key = company_key(name)
+    if not key:
+        result = None
+    elif key in aliases:
+        canonical = aliases[key]
+        result = (_slug(company_key(canonical)), canonical)
+    else:
+        result = (_slug(key), str(name).strip())
+
+    if isinstance(name, str):
+        resolved[name] = result
+    return result
+
+
+def canonicalize(series: pd.Series) -> pd.DataFrame:
+    """
+    company_id / company_name columns for a column of raw company strings
+    (each distinct spelling is resolved once).
+    """
+    mapping = {value: canonical_company(value) for value in series.dropna().unique()}
+    resolved = series.map(mapping)
+    return pd.DataFrame(
+        {
+            "company_id": resolved.map(lambda r: r[0] if isinstance(r, tuple) else None),
+            "company_name": resolved.map(lambda r: r[1] if isinstance(r, tuple) else None),
+        },
+        index=series.index,
+    )
+
+
+def aliases_for(company_id: str) -> list[str]:
+    """
+    Configured alternative spellings of `company_id`.
+    """
+    load_aliases()
+    return sorted(
+        alias
+        for canonical, names in _ALIAS_CACHE["spellings"].items()
+        if _slug(company_key(canonical)) == company_id
+        for alias in names
+    )
+
+
+# ========= PRECOMPUTED STATS =========
+def _empty_stats() -> pd.DataFrame:
+    return pd.DataFrame(columns=STATS_COLUMNS)
+
+
+def _aggregate(df: pd.DataFrame) -> pd.DataFrame:
+    named = {col: (col, "sum") for col in SUM_COLUMNS}
+    named["company"] = ("company", "first")
+    named["lpa_min"] = ("lpa_min", "min")
+    named["lpa_max"] = ("lpa_max", "max")
+    grouped = df.groupby(STATS_KEYS, dropna=False, sort=False).agg(**named).reset_index()
+    return grouped[STATS_COLUMNS]
+
+
+def build_company_stats(log_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregate attendance rows per (company, year, class):
+
+    - events:           all rows for the company
+    - placement_events: placement rows (the selection-rate denominator)
+    - offers:           placement rows with result == selected
+    - lpa_*:            sum / count / min / max and a histogram of LPA
+                        over offers (sums and counts keep rows mergeable)
+
+    year comes from event_date; undated rows get an empty year,
+    unmatched rows an empty class_id.
+    """
+    if log_df is None or log_df.empty or "company" not in log_df.columns:
+        return _empty_stats()
+
+    df = log_df.copy()
+    df.columns = [c.strip().lower() for c in df.columns]
+
+    companies = canonicalize(df["company"])
+    df = df[companies["company_id"].notna()]
+    companies = companies[companies["company_id"].notna()]
+    if df.empty:
+        return _empty_stats()
+
+    etype = df["event_type"].astype(str).str.strip().str.lower()
+    result = df["result"].astype(str).str.strip().str.lower()
+    placement = etype == "placement"
+    offers = placement & (result == "selected")
+
+    if "lpa" in df.columns:
+        lpa = pd.to_numeric(df["lpa"], errors="coerce").where(offers)
+    else:
+        lpa = pd.Series(float("nan"), index=df.index)
+
+    if "event_date" in df.columns:
+        year = pd.to_datetime(df["event_date"], errors="coerce").dt.year.astype("Int64")
+    else:
+        year = pd.Series(pd.NA, index=df.index, dtype="Int64")
+
+    class_id = df["class_id"] if "class_id" in df.columns else pd.Series(None, index=df.index)
+    class_id = class_id.astype(object).where(class_id.notna(), None)
+    class_id = class_id.map(lambda v: None if v is None else (str(v).strip() or None))
+
+    rows = pd.DataFrame(
+        {
+            "company_id": companies["company_id"],
+            "year": year,
+            "class_id": class_id,
+            "company": companies["company_name"],
+            "events": 1,
+            "placement_events": placement.astype(int),
+            "offers": offers.astype(int),
+            "lpa_sum": lpa,
+            "lpa_count": lpa.notna().astype(int),
+            "lpa_min": lpa,
+            "lpa_max": lpa,
+        }
+    )
+    for col, low, high in LPA_BUCKETS:
+        rows[col] = ((lpa >= low) & (lpa < high)).astype(int)
+    rows["lpa_sum"] = rows["lpa_sum"].fillna(0.0)
+
+    return _aggregate(rows)
+
+
+def merge_company_stats(base: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """
+    Combine two stats tables row key by row key.
+    """
+    if base is None or base.empty:
+        return delta.copy()
+    if delta is None or delta.empty:
+        return base.copy()
+    return _aggregate(pd.concat([base, delta], ignore_index=True))
+
+
+def save_company_stats(stats: pd.DataFrame) -> None:
+    atomic_write_csv(stats, STATS_PATH)
+    _STATS_CACHE.pop(str(STATS_PATH), None)
+
+
+def _read_company_stats() -> pd.DataFrame:
+    """
+    Read the stats file, reusing the parsed copy while the file is unchanged.
+    """
+    mtime = STATS_PATH.stat().st_mtime
+    cached = _STATS_CACHE.get(str(STATS_PATH))
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    df = pd.read_csv(STATS_PATH, dtype={"company_id": str, "class_id": str, "company": str})
+    df["year"] = pd.to_numeric(df["year"], errors="coerce").astype("Int64")
+    _STATS_CACHE[str(STATS_PATH)] = (mtime, df)
+    return df
+
+
+def _stats_stale() -> bool:
+    # an edited alias file regroups companies, so the stats are rebuilt
+    if not STATS_PATH.exists():
+        return True
+    mtime = _aliases_mtime()
+    return mtime is not None and mtime > STATS_PATH.stat().st_mtime
+
+
+def load_company_stats() -> pd.DataFrame:
+    """
+    Load the precomputed company stats, building them once from the
+    attendance log if missing or older than the alias file
+    (under the journal lock, so no write slips in between).
+    """
+    if not _stats_stale():
+        return _read_company_stats()
+
+    from app.class_summary import load_attendance_log
+
+    with JOURNAL.locked():
+        if _stats_stale():
+            rebuild_company_stats(load_attendance_log())
+    return _read_company_stats()
+
+
+def update_company_stats(new_log_df: pd.DataFrame) -> None:
+    """
+    Fold freshly appended attendance rows into the stored stats.
+    """
+    if new_log_df is None or new_log_df.empty:
+        return
+    if _stats_stale():
+        # load_company_stats() will build from the full log later
+        return
+
+    save_company_stats(merge_company_stats(_read_company_stats(), build_company_stats(new_log_df)))
+
+
+def refresh_company_stats(log_df: pd.DataFrame, changed_df: pd.DataFrame) -> None:
+    """
+    Recompute only the companies touched by edited rows (min / max LPA
+    cannot be un-merged). `changed_df` holds the rows before and after
+    the edit, `log_df` the full log after it.
+    """
+    if changed_df is None or changed_df.empty or "company" not in changed_df.columns:
+        return
+    if _stats_stale():
+        return
+
+    affected = set(canonicalize(changed_df["company"])["company_id"].dropna())
+    if not affected or "company" not in log_df.columns:
+        return
+
+    in_log = canonicalize(log_df["company"])["company_id"].isin(affected).to_numpy()
+    stored = _read_company_stats()
+    save_company_stats(
+        pd.concat(
+            [stored[~stored["company_id"].isin(affected)], build_company_stats(log_df[in_log])],
+            ignore_index=True,
+        )[STATS_COLUMNS]
+    )
+
+
+def rebuild_company_stats(log_df: pd.DataFrame) -> None:
+    """
+    Recompute the stats from the full log
+    (first build, alias edits, or after a journal replay).
+    """
+    save_company_stats(build_company_stats(log_df))
+
+
+# ========= QUERIES =========
+def _summarize(rows: pd.DataFrame) -> dict:
+    placement_events = int(rows["placement_events"].sum())
+    offers = int(rows["offers"].sum())
+    lpa_count = int(rows["lpa_count"].sum())
+    return {
+        "events": int(rows["events"].sum()),
+        "placement_events": placement_events,
+        "offers": offers,
+        "selection_rate": offers / placement_events if placement_events else None,
+        "avg_lpa": float(rows["lpa_sum"].sum()) / lpa_count if lpa_count else None,
+        "min_lpa": float(rows["lpa_min"].min()) if rows["lpa_min"].notna().any() else None,
+        "max_lpa": float(rows["lpa_max"].max()) if rows["lpa_max"].notna().any() else None,
+        "lpa_distribution": {
+            col[len("lpa_"):]: int(rows[col].sum()) for col, _, _ in LPA_BUCKETS
+        },
+    }
+
+
+def _check_year(stats: pd.DataFrame, year: int | None) -> pd.DataFrame:
+    if year is None:
+        return stats
+    return stats[stats["year"] == year]
+
+
+def list_companies(year: int | None = None) -> list[dict]:
+    """
+    One summary per company (optionally for one year), most offers first.
+    """
+    stats = _check_year(load_company_stats(), year)
+    companies = []
+    for company_id, rows in stats.groupby("company_id", sort=False):
+        companies.append(
+            {
+                "company_id": company_id,
+                "company": rows["company"].iloc[0],
+                "years": sorted(int(y) for y in rows["year"].dropna().unique()),
+                **_summarize(rows),
+            }
+        )
+    companies.sort(key=lambda c: (-c["offers"], c["company"].lower()))
+    return companies
+
+
+def get_company(company_id: str, year: int | None = None) -> dict | None:
+    """
+    Totals, per-year and per-class breakdown for one company,
+    or None if the company has no rows.
+    """
+    stats = load_company_stats()
+    rows = stats[stats["company_id"] == str(company_id).strip().lower()]
+    if rows.empty:
+        return None
+
+    by_year = [
+        {"year": int(y), **_summarize(group)}
+        for y, group in rows[rows["year"].notna()].groupby("year", sort=True)
+    ]
+    undated = rows[rows["year"].isna()]
+    if not undated.empty:
+        by_year.append({"year": None, **_summarize(undated)})
+
+    scoped = _check_year(rows, year)
+    by_class = [
+        {"class_id": cid, **_summarize(group)}
+        for cid, group in scoped[scoped["class_id"].notna()].groupby("class_id", sort=True)
+    ]
+
+    company_id = rows["company_id"].iloc[0]
+    return {
+        "company_id": company_id,
+        "company": rows["company"].iloc[0],
+        "aliases": aliases_for(company_id),
+        "year": year,
+        **_summarize(scoped),
+        "by_year": by_year,
+        "by_class": by_class,
+    }
@@ -0,0 +1,135 @@
+import gzip
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+
+def _parse_accept_encoding(value: str) -> dict[str, float]:
+    """
+    "gzip, br;q=0.8, *;q=0" -> {"gzip": 1.0, "br": 0.8, "*": 0.0}
+    """
+    encodings = {}
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, params = part.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        encodings[name.strip().lower()] = q
+    return encodings
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """
+    Pick br (if the brotli package is installed) or gzip from the
+    client's Accept-Encoding, preferring the higher q-value.
+    """
+    accepted = _parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+
+    candidates = []
+    if brotli is not None:
+        candidates.append(("br", accepted.get("br", wildcard)))
+    candidates.append(("gzip", accepted.get("gzip", wildcard)))
+
+    best, best_q = None, 0.0
+    for name, q in candidates:
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Compress buffered responses (our JSON endpoints) above `minimum_size`
+    with brotli or gzip, as negotiated via Accept-Encoding.
+
+    Streaming responses (e.g. the /api/changes event stream) and responses
+    that already carry a Content-Encoding are passed through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for key, value in scope.get("headers", []):
+            if key == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        body_parts: list[bytes] = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = {k.lower(): v for k, v in message.get("headers", [])}
+                content_type = headers.get(b"content-type", b"")
+                if b"content-encoding" in headers or content_type.startswith(b"text/event-stream"):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                if start_message is not None and len(body_parts) == 1:
+                    # a real stream: don't hold it back, send it as-is
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                return
+
+            body = b"".join(body_parts)
+            if len(body) < self.minimum_size:
+                await send(start_message)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            if encoding == "br":
+                compressed = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                compressed = gzip.compress(body, compresslevel=self.gzip_level)
+
+            vary = [v for k, v in start_message.get("headers", []) if k.lower() == b"vary"]
+            headers = [
+                (k, v)
+                for k, v in start_message.get("headers", [])
+                if k.lower() not in (b"content-length", b"vary")
+            ]
+            headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(compressed)).encode("latin-1")),
+                (b"vary", b", ".join(vary + [b"Accept-Encoding"])),
+            ]
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
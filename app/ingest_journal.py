@@ -0,0 +1,434 @@
+from contextlib import contextmanager
+from pathlib import Path
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+try:
+    import fcntl  # POSIX only; elsewhere the journal is single-process
+except ImportError:
+    fcntl = None
+
+# Base dir = project root (place_modle)
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+DATA_DIR.mkdir(exist_ok=True)
+
+LOG_PATH = DATA_DIR / "attendance_log.csv"
+JOURNAL_PATH = DATA_DIR / "attendance_journal.jsonl"
+LOCK_PATH = DATA_DIR / "attendance_journal.lock"
+
+# group commit: fold the journal into attendance_log.csv once this many
+# rows are pending, or when the oldest pending entry is this old
+COMMIT_MAX_ROWS = int(os.environ.get("JOURNAL_COMMIT_MAX_ROWS", 5000))
+COMMIT_INTERVAL_SECONDS = float(os.environ.get("JOURNAL_COMMIT_INTERVAL_SECONDS", 5))
+
+logger = logging.getLogger(__name__)
+
+
+def _stat(path: Path):
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _fsync_dir(path: Path) -> None:
+    if os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write_csv(df: pd.DataFrame, path: Path) -> None:
+    """
+    Write `df` to `path` via a synced temp file + rename, so readers and
+    crashes only ever see the old or the new file, never a torn one.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False)
+    with open(tmp_path, "w", encoding="utf-8", newline="") as fh:
+        fh.write(buffer.getvalue())
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(path.parent)
+
+
+class IngestJournal:
+    """
+    Append-only write-ahead journal in front of attendance_log.csv.
+
+    - append() / update() write one JSON line per batch and fsync it:
+      once they return, the batch survives a crash
+    - commit() folds every pending entry into the CSV in one atomic
+      rewrite (temp file + rename) and truncates the journal
+    - view() is the CSV with the journal entries applied on top, so
+      reads see a batch as soon as it is journaled
+
+    Entries:
+        {"op": "append", "rows": [...]}   new rows (de-duplicated by fingerprint)
+        {"op": "update", "rows": [...]}   full rows replacing the same attendance_id
+        {"op": "derived"}                 the trend rollups / company stats
+                                          include every entry before it
+
+    Writers update the derived stores while holding the lock, then
+    mark_derived(). If an earlier writer never got that far (crash,
+    error), the next writer rebuilds the stores instead of folding its
+    batch in; commit() and replay() do the same before the journal is
+    truncated.
+
+    Replaying an entry that already reached the CSV is harmless: appends
+    are de-duplicated by fingerprint and updates overwrite with the same
+    values. Other processes (e.g. the bulk ingest CLI) share the files
+    through an flock on attendance_journal.lock.
+    """
+
+    def __init__(self, log_path: Path = LOG_PATH, journal_path: Path = JOURNAL_PATH, lock_path: Path = LOCK_PATH):
+        self.log_path = log_path
+        self.journal_path = journal_path
+        self.lock_path = lock_path
+        self.lock = threading.RLock()
+        self.lock_depth = 0
+
+        self.base_version = None
+        self.base: pd.DataFrame | None = None
+        self.offset = 0                 # bytes of the journal already applied
+        self.appends: list[pd.DataFrame] = []
+        self.updates: dict[str, dict] = {}
+        self.pending_since: float | None = None
+        self.cached_view: pd.DataFrame | None = None
+        self.underived = 0              # entries not yet in the derived stores
+
+        self.committer: threading.Thread | None = None
+        self.stop_event = threading.Event()
+
+    # ---- locking ----
+    def locked(self):
+        """
+        Exclusive lock (threads + processes) for a write together with
+        its derived-store updates:
+
+            with JOURNAL.locked():
+                stale = JOURNAL.underived_entries()
+                added = JOURNAL.append(rows)
+                ...  # fold `added` in, or rebuild if stale
+                JOURNAL.mark_derived()
+        """
+        return self._file_lock(exclusive=True)
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool = True):
+        with self.lock:
+            # flock is per open file, so only the outermost call takes it
+            if fcntl is None or self.lock_depth:
+                self.lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self.lock_depth -= 1
+                return
+            with open(self.lock_path, "a") as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                self.lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self.lock_depth -= 1
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    # ---- reading ----
+    def _read_base(self) -> pd.DataFrame:
+        from app.class_summary import parse_log_types
+
+        if not self.log_path.exists():
+            return pd.DataFrame()
+        df = pd.read_csv(self.log_path)
+        df.columns = [c.strip().lower() for c in df.columns]
+        return parse_log_types(df)
+
+    def _reset(self) -> None:
+        self.offset = 0
+        self.appends = []
+        self.updates = {}
+        self.pending_since = None
+        self.cached_view = None
+        self.underived = 0
+
+    def _apply(self, entry: dict) -> None:
+        from app.class_summary import parse_log_types
+
+        if entry.get("op") == "derived":
+            self.underived = 0
+            return
+        rows = entry.get("rows") or []
+        if not rows:
+            return
+        self.underived += 1
+        if entry.get("op") == "update":
+            for row in rows:
+                self.updates[str(row.get("attendance_id"))] = row
+        else:
+            self.appends.append(parse_log_types(pd.DataFrame(rows)))
+        if self.pending_since is None:
+            self.pending_since = time.monotonic()
+        self.cached_view = None
+
+    def _refresh(self) -> None:
+        """
+        Catch up with the files: reload the CSV if it was rewritten and
+        apply journal lines written since the last refresh (by this or
+        another process). Caller holds the file lock.
+        """
+        base_version = _stat(self.log_path)
+        journal_size = (_stat(self.journal_path) or (0, 0))[1]
+
+        if self.base is None or base_version != self.base_version or journal_size < self.offset:
+            # first read, or someone committed: start over from the new CSV
+            self.base = self._read_base()
+            self.base_version = base_version
+            self._reset()
+
+        if journal_size == self.offset:
+            return
+
+        with open(self.journal_path, "rb") as fh:
+            fh.seek(self.offset)
+            chunk = fh.read(journal_size - self.offset)
+
+        # only whole lines; a torn tail is picked up once it's complete
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+        self.offset += end
+
+    def view(self) -> pd.DataFrame:
+        """
+        attendance_log.csv with every journaled batch applied.
+        Callers must not mutate the returned frame.
+        """
+        with self._file_lock(exclusive=False):
+            self._refresh()
+            if self.cached_view is None:
+                self.cached_view = self._merge()
+            return self.cached_view
+
+    def _merge(self) -> pd.DataFrame:
+        from app.class_summary import parse_log_types
+
+        frames = [df for df in [self.base, *self.appends] if df is not None and not df.empty]
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].copy()
+        if self.appends and "fingerprint_hash" in df.columns:
+            df = df.drop_duplicates(subset=["fingerprint_hash"]).reset_index(drop=True)
+
+        if self.updates and "attendance_id" in df.columns:
+            ids = df["attendance_id"].astype(str)
+            mask = ids.isin(self.updates)
+            if mask.any():
+                changed = pd.DataFrame([self.updates[i] for i in ids[mask]], index=df.index[mask])
+                for col in changed.columns:
+                    if col not in df.columns:
+                        df[col] = None
+                    df[col] = df[col].astype(object)
+                    df.loc[mask, col] = changed[col]
+                df = parse_log_types(df.infer_objects())
+        return df
+
+    def pending_rows(self) -> int:
+        with self.lock:
+            return sum(len(df) for df in self.appends) + len(self.updates)
+
+    def has_data(self) -> bool:
+        """
+        True once the log exists on disk, committed or not.
+        """
+        return self.log_path.exists() or (_stat(self.journal_path) or (0, 0))[1] > 0
+
+    def version(self):
+        """
+        Changes whenever the CSV is rewritten or the journal grows.
+        """
+        return (_stat(self.log_path), _stat(self.journal_path))
+
+    # ---- writing ----
+    def _drop_torn_tail(self) -> None:
+        # caller holds the exclusive lock and has just refreshed, so
+        # anything past `offset` is a partial line from a crashed writer
+        size = (_stat(self.journal_path) or (0, 0))[1]
+        if size > self.offset:
+            os.truncate(self.journal_path, self.offset)
+
+    def _write_entry(self, op: str, rows: pd.DataFrame) -> None:
+        # caller holds the exclusive file lock and has just refreshed
+        payload = rows.to_json(orient="records", date_format="iso")
+        line = f'{{"op": "{op}", "rows": {payload}}}\n'.encode("utf-8")
+
+        self._drop_torn_tail()
+        with open(self.journal_path, "ab") as fh:
+            fh.write(line)
+            fh.flush()
+            os.fsync(fh.fileno())
+        self._refresh()
+
+    def append(self, new_rows: pd.DataFrame) -> pd.DataFrame:
+        """
+        Journal new attendance rows, skipping fingerprints already in the
+        log (or repeated within the batch). Returns the rows journaled.
+        """
+        if new_rows is None or new_rows.empty:
+            return pd.DataFrame()
+
+        with self._file_lock():
+            self._refresh()
+            added = new_rows
+            if "fingerprint_hash" in added.columns:
+                added = added.drop_duplicates(subset=["fingerprint_hash"])
+                current = self.view()
+                if "fingerprint_hash" in current.columns:
+                    known = set(current["fingerprint_hash"].astype(str))
+                    added = added[~added["fingerprint_hash"].astype(str).isin(known)]
+            if added.empty:
+                return added
+            self._write_entry("append", added)
+            return added
+
+    def underived_entries(self) -> int:
+        """
+        Journal entries the derived stores are missing. Writers hold the
+        lock across their whole update, so under the lock a non-zero
+        count means an earlier writer failed or crashed half-way.
+        """
+        with self._file_lock():
+            self._refresh()
+            return self.underived
+
+    def mark_derived(self) -> None:
+        """
+        Record that the derived stores now include every journaled entry.
+        Not synced: losing the marker only costs a rebuild.
+        """
+        with self._file_lock():
+            self._refresh()
+            if not self.underived:
+                return
+            self._drop_torn_tail()
+            with open(self.journal_path, "ab") as fh:
+                fh.write(b'{"op": "derived"}\n')
+            self._refresh()
+
+    def _derive(self, log_df: pd.DataFrame) -> None:
+        from app.class_summary import rebuild_derived_stores
+
+        rebuild_derived_stores(log_df)
+
+    def update(self, rows: pd.DataFrame) -> None:
+        """
+        Journal full replacement rows for existing attendance_ids.
+        """
+        if rows is None or rows.empty:
+            return
+        with self._file_lock():
+            self._refresh()
+            self._write_entry("update", rows)
+
+    def commit(self) -> int:
+        """
+        Group commit: write the merged log to attendance_log.csv
+        atomically, then truncate the journal. Returns the number of
+        journaled rows folded in.
+        """
+        with self._file_lock():
+            self._refresh()
+            pending = self.pending_rows()
+            if not pending:
+                return 0
+
+            merged = self._merge()
+            atomic_write_csv(merged, self.log_path)
+            if self.underived:
+                # a writer died (or failed) between journaling and
+                # updating the rollups / company stats
+                logger.warning("rebuilding derived stores for %d journal entries", self.underived)
+                self._derive(merged)
+
+            # a crash before this line only means replaying entries
+            # that are already in the CSV
+            with open(self.journal_path, "r+b") as fh:
+                fh.truncate(0)
+                fh.flush()
+                os.fsync(fh.fileno())
+
+            self.base = merged
+            self.base_version = _stat(self.log_path)
+            self._reset()
+            return pending
+
+    def maybe_commit(self) -> int:
+        """
+        Commit if enough rows are pending or the oldest entry is old enough.
+        """
+        with self.lock:
+            due = self.pending_rows() >= COMMIT_MAX_ROWS or (
+                self.pending_since is not None
+                and time.monotonic() - self.pending_since >= COMMIT_INTERVAL_SECONDS
+            )
+        return self.commit() if due else 0
+
+    def replay(self) -> int:
+        """
+        Startup recovery: apply whatever the journal holds (dropping a
+        torn last line) and commit it into the CSV. Anything replayed
+        also rebuilds the derived stores, whatever the markers say.
+        """
+        with self._file_lock():
+            self.base = None
+            self._refresh()
+            self._drop_torn_tail()
+            if self.pending_rows():
+                self.underived = max(self.underived, 1)
+            return self.commit()
+
+    # ---- background committer ----
+    def start(self) -> None:
+        """
+        Commit pending entries every COMMIT_INTERVAL_SECONDS in a daemon thread.
+        """
+        if self.committer is not None and self.committer.is_alive():
+            return
+        self.stop_event.clear()
+        self.committer = threading.Thread(target=self._run, name="journal-committer", daemon=True)
+        self.committer.start()
+
+    def _run(self) -> None:
+        while not self.stop_event.wait(COMMIT_INTERVAL_SECONDS):
+            try:
+                self.maybe_commit()
+            except Exception:
+                # the journal is kept: the next tick (or replay) retries
+                logger.exception("journal group commit failed; %d rows still pending", self.pending_rows())
+
+    def stop(self) -> None:
+        """
+        Stop the committer and fold in whatever is still pending.
+        """
+        self.stop_event.set()
+        if self.committer is not None:
+            self.committer.join(timeout=COMMIT_INTERVAL_SECONDS + 1)
+            self.committer = None
+        self.commit()
+
+
+JOURNAL = IngestJournal()
@@ -0,0 +1,274 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from app.companies import aliases_version, canonicalize
+
+# id-like columns: stripped strings, missing -> None
+ID_COLUMNS = ["attendance_id", "fingerprint_hash", "student_id", "class_id"]
+
+# helper columns added once at load, never returned by default
+DERIVED_COLUMNS = {
+    "event_type_norm": lambda df: _lower(df["event_type"]),
+    "result_norm": lambda df: _lower(df["result"]),
+    "lpa_num": lambda df: pd.to_numeric(df["lpa"], errors="coerce"),
+}
+# plus company_norm / company_id, the canonical company name and id
+# ("TCS" -> "Tata Consultancy Services"), see normalize_log
+
+
+def _stripped(series: pd.Series) -> pd.Series:
+    out = series.astype(object).where(series.notna(), None)
+    out = out.map(lambda v: None if v is None else (str(v).strip() or None))
+    return out
+
+
+def _lower(series: pd.Series) -> pd.Series:
+    return _stripped(series).map(lambda v: None if v is None else v.lower())
+
+
+def json_safe(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.astype(object)
+    return df.where(pd.notnull(df), None)
+
+
+class LogSnapshot:
+    """
+    One normalized version of the log plus its lazily built indexes
+    (column -> {value: row positions}).
+    """
+
+    def __init__(self, frame: pd.DataFrame, base_columns: list[str]):
+        self.frame = frame
+        self.base_columns = base_columns
+        self.indexes: dict[str, dict] = {}
+
+    def index(self, column: str) -> dict:
+        idx = self.indexes.get(column)
+        if idx is None:
+            idx = self.frame.groupby(column, dropna=True, sort=False).indices
+            self.indexes[column] = idx
+        return idx
+
+
+def normalize_log(df: pd.DataFrame | None) -> LogSnapshot:
+    """
+    Lower-case columns, strip ids, coerce matched to bool and add the
+    DERIVED_COLUMNS helpers.
+    """
+    df = pd.DataFrame() if df is None else df.copy()
+    df.columns = [c.strip().lower() for c in df.columns]
+    base_columns = list(df.columns)
+
+    for col in ("event_type", "result", "company", "lpa", "matched", *ID_COLUMNS):
+        if col not in df.columns:
+            df[col] = None
+    for col in ID_COLUMNS:
+        df[col] = _stripped(df[col])
+    df["matched"] = df["matched"].map(
+        lambda v: v if isinstance(v, (bool, np.bool_)) else str(v).strip().lower() == "true"
+    ).astype(bool)
+    for col, build in DERIVED_COLUMNS.items():
+        df[col] = build(df)
+    companies = canonicalize(df["company"])
+    df["company_norm"] = companies["company_name"]
+    df["company_id"] = companies["company_id"]
+
+    return LogSnapshot(df.reset_index(drop=True), base_columns)
+
+
+class LogStore:
+    """
+    The attendance log, loaded and normalized once per version of the
+    CSV + ingest journal (mtime + size of each) and company alias file,
+    so handlers stop re-reading and re-cleaning it.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.current: LogSnapshot | None = None
+        self.lock = threading.Lock()
+
+    def _file_version(self):
+        from app.ingest_journal import JOURNAL
+
+        # the CSV plus the journal overlay in front of it; the alias file
+        # decides company_norm / company_id
+        return (JOURNAL.version(), aliases_version())
+
+    def _load(self) -> pd.DataFrame:
+        from app.class_summary import load_attendance_log
+
+        return load_attendance_log()
+
+    def snapshot(self) -> LogSnapshot:
+        """
+        The current normalized log; reloads when the file changed on disk.
+        Callers must not mutate the returned frame.
+        """
+        with self.lock:
+            version = self._file_version()
+            if self.current is None or version is None or version != self.version:
+                self.current = normalize_log(self._load())
+                # the version seen *before* loading: a write landing
+                # mid-load then forces another reload next time
+                self.version = version
+            return self.current
+
+
+STORE = LogStore()
+
+
+class LogQuery:
+    """
+    Lazy, immutable query over the attendance log:
+
+        attendance_log().where(class_id=cid).select("student_id", "company").records()
+        attendance_log().where(student_id=sid).agg(max_lpa=("lpa_num", "max"))
+        attendance_log().where(class_id=cid).group_by("company_norm").agg(
+            placed=("student_id", "nunique"))
+
+    Nothing is read until a terminal call (collect / records / count /
+    agg / distinct). Equality filters go through the store's indexes,
+    other filters run only on the rows that survive them, and only the
+    columns the result needs are materialized.
+    """
+
+    def __init__(self, store: LogStore, equals=(), masks=(), columns=None, order=None, group=None):
+        self.store = store
+        self.equals = tuple(equals)      # (column, frozenset(values))
+        self.masks = tuple(masks)        # callables: frame -> bool Series
+        self.columns = columns           # projection, None = original columns
+        self.order = order               # column to sort by (stable, NaN first)
+        self.group = group
+
+    def _replace(self, **changes) -> "LogQuery":
+        params = {
+            "equals": self.equals,
+            "masks": self.masks,
+            "columns": self.columns,
+            "order": self.order,
+            "group": self.group,
+        }
+        params.update(changes)
+        return LogQuery(self.store, **params)
+
+    # ---- plan building ----
+    def where(self, **equals) -> "LogQuery":
+        """
+        Equality filters, e.g. where(class_id="CSE-A-2025", matched=False).
+        """
+        added = tuple((col, frozenset([_key(val)])) for col, val in equals.items())
+        return self._replace(equals=self.equals + added)
+
+    def where_in(self, column: str, values) -> "LogQuery":
+        return self._replace(
+            equals=self.equals + ((column, frozenset(_key(v) for v in values)),)
+        )
+
+    def where_notna(self, column: str) -> "LogQuery":
+        return self._replace(masks=self.masks + (lambda df: df[column].notna(),))
+
+    def select(self, *columns: str) -> "LogQuery":
+        return self._replace(columns=list(columns))
+
+    def order_by(self, column: str) -> "LogQuery":
+        return self._replace(order=column)
+
+    def group_by(self, column: str) -> "LogQuery":
+        return self._replace(group=column)
+
+    # ---- execution ----
+    def _execute(self, needed: list[str] | None) -> pd.DataFrame:
+        snap = self.store.snapshot()
+        rows = snap.frame
+
+        # the most selective equality filter goes through its index;
+        # the others are checked on the rows it leaves
+        best = None
+        for column, values in self.equals:
+            if column not in rows.columns:
+                return rows.iloc[0:0][[c for c in (needed or snap.base_columns) if c in rows.columns]]
+            index = snap.index(column)
+            size = sum(len(index[v]) for v in values if v in index)
+            if best is None or size < best[0]:
+                best = (size, column, values)
+
+        if best is not None:
+            _, column, values = best
+            index = snap.index(column)
+            hits = [index[v] for v in values if v in index]
+            positions = np.sort(np.concatenate(hits)) if hits else np.array([], dtype=np.int64)
+            rows = rows.iloc[positions]
+            for other, other_values in self.equals:
+                if other != column or other_values != values:
+                    rows = rows[rows[other].isin(other_values)]
+
+        for mask in self.masks:
+            rows = rows[mask(rows)]
+
+        if self.order is not None and self.order in rows.columns:
+            rows = rows.sort_values(self.order, kind="stable", na_position="first")
+
+        columns = needed or self.columns or snap.base_columns
+        return rows[[c for c in columns if c in rows.columns]]
+
+    def collect(self) -> pd.DataFrame:
+        return self._execute(None)
+
+    def records(self) -> list[dict]:
+        return json_safe(self.collect()).to_dict(orient="records")
+
+    def count(self) -> int:
+        return int(len(self._execute(["attendance_id"])))
+
+    def distinct(self, column: str) -> list:
+        values = self._execute([column])[column].dropna().unique().tolist()
+        return sorted(values)
+
+    def agg(self, **named):
+        """
+        Named aggregations, pandas-style: agg(n=("student_id", "nunique")).
+
+        Without group_by: {name: value}. With group_by(col):
+        {group value: {name: value}}. NaN results come back as None.
+        """
+        needed = sorted({col for col, _ in named.values()} | ({self.group} if self.group else set()))
+        rows = self._execute(needed)
+
+        if self.group is None:
+            result = {}
+            for name, (col, func) in named.items():
+                series = rows[col] if col in rows.columns else pd.Series(dtype=object)
+                result[name] = _scalar(series.agg(func))
+            return result
+
+        rows = rows[rows[self.group].notna()]
+        if rows.empty:
+            return {}
+        grouped = rows.groupby(self.group, sort=False).agg(**named)
+        return {
+            key: {name: _scalar(val) for name, val in values.items()}
+            for key, values in grouped.to_dict(orient="index").items()
+        }
+
+
+def _key(value):
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if value is None:
+        return None
+    return str(value).strip()
+
+
+def _scalar(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def attendance_log() -> LogQuery:
+    return LogQuery(STORE)
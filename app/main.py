@@ -1,20 +1,54 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, Depends, UploadFile, File, HTTPException, Query, Request
 from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from app.matching import load_students
 from pathlib import Path
 import pandas as pd
 import io
-import uuid  
+import logging
+import zipfile
 
 from app.class_summary import (
+    EVENT_REQUIRED_COLUMNS,
     get_class_summary,
     generate_attendance_log_from_df,
     save_attendance_log,
     load_attendance_log,
+    load_log_rows_by_fingerprint,
+    update_attendance_rows,
+    write_attendance_log,
+)
+from app.ingest_journal import JOURNAL
+from app.bulk_ingest import ingest_files
+from app.log_query import attendance_log, json_safe
+from app.sessions import SESSIONS, get_session
+from app.change_feed import (
+    EPOCH,
+    get_class_version,
+    publish_row_resolved,
+    publish_rows_rematched,
+    stream_events,
+)
+from app.student_search import get_search_index, refresh_search_index
+from app.student_upsert import diff_students, rematch_affected
+from app.trends import query_trends
+from app.companies import list_companies, get_company
+from app.compression import CompressionMiddleware
+from app.wire_format import check_format, rows_payload
+from app.upload_registry import (
+    load_registry,
+    file_fingerprints,
+    find_upload,
+    find_prefix_upload,
+    split_tail,
+    record_upload,
 )
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 
 # CORS for frontend
@@ -29,6 +63,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip / brotli for large JSON bodies (rosters, unmatched queue, upload echo)
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+
+@app.on_event("startup")
+def start_ingest_journal():
+    # fold in batches journaled before a crash / restart, then
+    # group-commit new ones in the background
+    replayed = JOURNAL.replay()
+    if replayed:
+        logger.info("journal replay committed %d rows", replayed)
+    JOURNAL.start()
+
+
+@app.on_event("shutdown")
+def stop_ingest_journal():
+    JOURNAL.stop()
+
+
+def _wire_format(fmt: str) -> str:
+    """
+    Validate the ?format= query param (json | columnar).
+    """
+    try:
+        return check_format(fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # ---- Very simple in-memory auth ----
 USERS = {
     # you can change these emails/passwords
@@ -36,8 +98,7 @@ USERS = {
     "viewer@example.com": {"password": "viewer123", "role": "viewer"},
 }
 
-# token -> email
-TOKENS: dict[str, str] = {}
+# sessions: TTL + LRU capped, optionally SQLite-backed (see app/sessions.py)
 
 
 class LoginRequest(BaseModel):
@@ -57,9 +118,19 @@ def api_login(body: LoginRequest):
     if not user or user["password"] != body.password:
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
-    token = str(uuid.uuid4())
-    TOKENS[token] = body.email
-    return {"token": token, "email": body.email, "role": user["role"]}
+    session = SESSIONS.create(body.email, user["role"])
+    return {"token": session["token"], "email": body.email, "role": user["role"]}
+
+
+@app.get("/api/me", response_model=LoginResponse)
+def api_me(session: dict = Depends(get_session)):
+    return {"token": session["token"], "email": session["email"], "role": session["role"]}
+
+
+@app.post("/api/logout")
+def api_logout(session: dict = Depends(get_session)):
+    SESSIONS.revoke(session["token"])
+    return {"ok": True}
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent   # go up one level
@@ -71,7 +142,99 @@ STUDENTS_MASTER_PATH = DATA_DIR / "students_master.csv"
 # ========= CLASS SUMMARY =========
 @app.get("/api/class_summary/{class_id}")
 def api_class_summary(class_id: str):
-    return get_class_summary(class_id)
+    # read the version first: a change landing mid-computation then
+    # shows up as a newer version on the change feed
+    version = get_class_version(class_id)
+    summary = get_class_summary(class_id)
+    summary["version"] = version
+    # versions are per process: only comparable to feed events
+    # carrying the same epoch
+    summary["epoch"] = EPOCH
+    return summary
+
+# ========= CHANGE FEED =========
+@app.get("/api/changes")
+async def api_changes(request: Request):
+    """
+    Server-sent events feed of data changes:
+      - attendance_added      new log rows (unmatched rows inline)
+      - attendance_resolved   a row was manually matched
+      - attendance_rematched  rows re-matched after a students upsert
+    Every event carries class_versions {class_id: version} for the
+    classes whose aggregates changed, so clients refetch only those.
+
+    Sequence numbers and class versions live in this server process
+    (identified by `epoch`). With several workers, a summary's version
+    can only be compared to events with the same epoch, and a stream only
+    reports changes made through its own worker. Writes from other
+    processes (other workers, `python -m app.bulk_ingest`) are not
+    published at all. Clients therefore refetch on every reconnect
+    ("hello") and whenever the epochs differ.
+    """
+    return StreamingResponse(
+        stream_events(request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ========= TRENDS =========
+@app.get("/api/trends")
+def api_trends(
+    granularity: str = "month",
+    dimension: str = "class",
+    key: str | None = None,
+    start: str | None = None,
+    end: str | None = None,
+):
+    """
+    Selections / offers / avg & max LPA over time, per class or company.
+    Served from the pre-aggregated rollups, not the raw log.
+
+    e.g. /api/trends?granularity=week&dimension=company&start=2025-01-01
+    """
+    try:
+        return query_trends(granularity, dimension, key, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ========= COMPANIES =========
+@app.get("/api/companies")
+def api_companies(year: int | None = None):
+    """
+    Every company (aliases merged, e.g. TCS = Tata Consultancy Services)
+    with offers, selection rate and LPA distribution, optionally for one year.
+    Served from the precomputed company stats, not the raw log.
+    """
+    companies = list_companies(year)
+    return {"year": year, "rows": len(companies), "data": companies}
+
+@app.get("/api/companies/{company_id}")
+def api_company_detail(company_id: str, year: int | None = None):
+    """
+    One company: totals, per-year history and per-class breakdown
+    (the class breakdown is limited to `year` if given).
+    """
+    company = get_company(company_id, year)
+    if company is None:
+        raise HTTPException(status_code=404, detail=f"No company found with company_id={company_id}")
+    return company
+
+@app.get("/api/students/search")
+def api_students_search(q: str = "", class_id: str | None = None, limit: int = 20):
+    """
+    Typeahead lookup over name / email / phone / student_id
+    (prefix match per word), optionally scoped to one class.
+    Used by the resolve-match workflow to find the right student_id.
+    """
+    limit = max(1, min(limit, 100))
+    try:
+        results = get_search_index().search(q, class_id=class_id, limit=limit)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=400,
+            detail="students_master.csv not found on server",
+        )
+    return {"rows": len(results), "data": results}
 
 @app.get("/api/students/{student_id}/events")
 def api_student_events(student_id: str):
@@ -107,22 +270,7 @@ def api_student_events(student_id: str):
 
     student_row = students_df[student_mask].iloc[0].to_dict()
 
-    # Load attendance log
-    log_df = load_attendance_log()
-    if log_df is None or log_df.empty:
-        events_list = []
-    else:
-        log_df.columns = [c.strip().lower() for c in log_df.columns]
-        if "student_id" not in log_df.columns:
-            events_list = []
-        else:
-            log_df["student_id"] = log_df["student_id"].astype(str).str.strip()
-            events = log_df[log_df["student_id"] == target_id].copy()
-
-            # Clean for JSON
-            events = events.astype(object)
-            events = events.where(pd.notnull(events), None)
-            events_list = events.to_dict(orient="records")
+    events_list = attendance_log().where(student_id=target_id).records()
 
     return jsonable_encoder(
         {
@@ -151,94 +299,27 @@ def api_student_detail(student_id: str):
     else:
         student_obj = student_row.iloc[0].to_dict()
 
-    # Load attendance log
-    log_df = load_attendance_log()
-    if log_df is None or log_df.empty:
-        events_df = None
-    else:
-        log_df.columns = [c.strip().lower() for c in log_df.columns]
-        events_df = log_df[
-            log_df["student_id"].astype(str).str.strip() == sid
-        ]
-
-    # Build events list
-    if events_df is None or events_df.empty:
-        events_list = []
-        summary = {
-            "total_events": 0,
-            "placements": 0,
-            "internships": 0,
-            "trainings": 0,
-            "max_lpa": None,
-            "avg_lpa_placed": None,
-            "companies": [],
-        }
-    else:
-        # ensure we have consistent types
-        events_df = events_df.copy()
-        etype = events_df["event_type"].astype(str).str.lower()
-        result = events_df["result"].astype(str).str.lower()
-
-        placed = events_df[(etype == "placement") & (result == "selected")]
-        internship = events_df[(etype == "internship") & (result == "selected")]
-        training = events_df[(etype == "training")]
-
-        # LPA metrics
-        max_lpa = None
-        avg_lpa_placed = None
-        if "lpa" in events_df.columns:
-            try:
-                lpa_all = pd.to_numeric(events_df["lpa"], errors="coerce")
-                if lpa_all.notna().any():
-                    max_lpa = float(lpa_all.max())
-            except Exception:
-                max_lpa = None
-
-        if "lpa" in placed.columns:
-            try:
-                lpa_placed = pd.to_numeric(placed["lpa"], errors="coerce")
-                if lpa_placed.notna().any():
-                    avg_lpa_placed = float(lpa_placed.mean())
-            except Exception:
-                avg_lpa_placed = None
-
-        # companies
-        companies = []
-        if "company" in events_df.columns:
-            companies = sorted(
-                set(
-                    events_df["company"]
-                    .astype(str)
-                    .str.strip()
-                    .replace({"": pd.NA})
-                    .dropna()
-                    .tolist()
-                )
-            )
-
-        summary = {
-            "total_events": int(len(events_df)),
-            "placements": int(len(placed)),
-            "internships": int(len(internship)),
-            "trainings": int(len(training)),
-            "max_lpa": max_lpa,
-            "avg_lpa_placed": avg_lpa_placed,
-            "companies": companies,
-        }
-
-        # make events JSON-safe
-        events_df = events_df.astype(object)
-        events_df = events_df.where(pd.notnull(events_df), None)
-        events_list = events_df.to_dict(orient="records")
+    events = attendance_log().where(student_id=sid)
+    placed = events.where(event_type_norm="placement", result_norm="selected")
+
+    summary = {
+        "total_events": events.count(),
+        "placements": placed.count(),
+        "internships": events.where(event_type_norm="internship", result_norm="selected").count(),
+        "trainings": events.where(event_type_norm="training").count(),
+        "max_lpa": events.agg(max_lpa=("lpa_num", "max"))["max_lpa"],
+        "avg_lpa_placed": placed.agg(avg=("lpa_num", "mean"))["avg"],
+        "companies": events.distinct("company_norm"),
+    }
 
     return {
         "student": student_obj,
-        "events": events_list,
+        "events": events.records(),
         "summary": summary,
     }
 
 @app.post("/api/upload_students")
-async def upload_students(file: UploadFile = File(...)):
+async def upload_students(file: UploadFile = File(...), mode: str = "replace"):
     """
     Upload a new students_master.csv and store it in data/students_master.csv.
 
@@ -248,14 +329,22 @@ async def upload_students(file: UploadFile = File(...)):
       - email
       - phone
       - class_id
+
+    mode=replace (default): overwrite the master as-is.
+    mode=upsert: diff against the current master by student_id and
+    re-match only the attendance rows affected by the changed students.
     """
+    if mode not in ("replace", "upsert"):
+        raise HTTPException(status_code=400, detail="mode must be 'replace' or 'upsert'")
+
     filename = file.filename or ""
     if not filename.lower().endswith(".csv"):
         raise HTTPException(status_code=400, detail="Only .csv files are supported")
 
     try:
         content = await file.read()
-        df = pd.read_csv(io.BytesIO(content))
+        # upsert diffs cell by cell, so read everything as text there
+        df = pd.read_csv(io.BytesIO(content), dtype=str if mode == "upsert" else None)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid CSV: {e}")
 
@@ -279,14 +368,56 @@ async def upload_students(file: UploadFile = File(...)):
     # ensure unique student_id (keep first)
     df = df.drop_duplicates(subset=["student_id"])
 
+    if mode == "upsert":
+        return upsert_students(df)
+
     # write to data/students_master.csv
     STUDENTS_MASTER_PATH.parent.mkdir(exist_ok=True, parents=True)
     df.to_csv(STUDENTS_MASTER_PATH, index=False)
+    refresh_search_index(df)
 
     return {
         "rows": int(len(df)),
         "path": str(STUDENTS_MASTER_PATH),
     }
+
+
+def upsert_students(df: pd.DataFrame) -> dict:
+    """
+    Apply only the inserts / updates / deletes of an uploaded master,
+    then re-match the attendance rows those changes can affect.
+    """
+    if STUDENTS_MASTER_PATH.exists():
+        old_df = pd.read_csv(STUDENTS_MASTER_PATH, dtype=str)
+    else:
+        old_df = None
+
+    diff = diff_students(old_df, df)
+    changed = diff["inserted"] or diff["updated"] or diff["deleted"]
+
+    stats = {"candidates": 0, "rematched": 0, "class_changed": 0}
+    if changed:
+        STUDENTS_MASTER_PATH.parent.mkdir(exist_ok=True, parents=True)
+        diff["merged"].to_csv(STUDENTS_MASTER_PATH, index=False)
+        refresh_search_index(diff["merged"])
+
+        if JOURNAL.has_data():
+            log_df = load_attendance_log()
+            log_df, stats = rematch_affected(log_df, diff)
+            if stats["rematched"] or stats["class_changed"]:
+                write_attendance_log(log_df)
+                publish_rows_rematched(stats["candidates"], stats["class_ids"])
+
+    return {
+        "rows": int(len(diff["merged"])),
+        "path": str(STUDENTS_MASTER_PATH),
+        "inserted": len(diff["inserted"]),
+        "updated": len(diff["updated"]),
+        "deleted": len(diff["deleted"]),
+        "log_rows_checked": stats["candidates"],
+        "log_rows_rematched": stats["rematched"],
+        "log_rows_class_changed": stats["class_changed"],
+    }
 @app.get("/api/classes")
 def api_classes():
     """
@@ -324,19 +455,20 @@ def api_classes():
 
     return {"classes": classes}
 @app.get("/api/class_students/{class_id}")
-def api_class_students(class_id: str):
+def api_class_students(class_id: str, fmt: str = Query("json", alias="format")):
     """
     Return all students in a given class_id.
     """
+    fmt = _wire_format(fmt)
     students_df = load_students()
     if students_df is None or students_df.empty:
-        return {"rows": 0, "data": []}
+        return {"rows": 0, "data": rows_payload([], fmt)}
 
     students_df = students_df.copy()
     students_df.columns = [c.strip().lower() for c in students_df.columns]
 
     if "class_id" not in students_df.columns:
-        return {"rows": 0, "data": []}
+        return {"rows": 0, "data": rows_payload([], fmt)}
 
     students_df["class_id"] = students_df["class_id"].astype(str).str.strip()
     students_df["student_id"] = students_df["student_id"].astype(str).str.strip()
@@ -345,26 +477,54 @@ def api_class_students(class_id: str):
     subset = students_df[students_df["class_id"] == cid]
 
     if subset.empty:
-        return {"rows": 0, "data": []}
+        return {"rows": 0, "data": rows_payload([], fmt)}
 
     subset = subset.astype(object)
     subset = subset.where(pd.notnull(subset), None)
 
     return {
         "rows": int(len(subset)),
-        "data": subset.to_dict(orient="records"),
+        "data": rows_payload(subset, fmt),
     }
 
 # ========= UPLOAD EVENTS =========
 @app.post("/api/upload_events")
-async def upload_events(file: UploadFile = File(...)):
+async def upload_events(
+    file: UploadFile = File(...),
+    fmt: str = Query("json", alias="format"),
+):
+    """
+    Parse, match and log an events CSV.
+
+    Uploads are registered by content hash:
+      - the exact same file again -> cached summary, nothing re-processed
+      - an earlier file + appended rows -> only the new tail is processed
+    """
+    fmt = _wire_format(fmt)
     filename = file.filename or ""
     if not filename.lower().endswith(".csv"):
         raise HTTPException(status_code=400, detail="Only .csv files are supported")
 
+    content = await file.read()
+
+    registry = load_registry()
+    cached = find_upload(registry, content)
+    if cached is not None:
+        return jsonable_encoder(
+            {
+                **cached["summary"],
+                "cached": True,
+                "data": rows_payload(
+                    load_log_rows_by_fingerprint(file_fingerprints(registry, cached)), fmt
+                ),
+            }
+        )
+
+    prior = find_prefix_upload(registry, content)
+    to_parse = split_tail(content, prior["size"]) if prior is not None else content
+
     try:
-        content = await file.read()
-        events_df = pd.read_csv(io.BytesIO(content))
+        events_df = pd.read_csv(io.BytesIO(to_parse))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid CSV: {e}")
 
@@ -372,16 +532,7 @@ async def upload_events(file: UploadFile = File(...)):
     events_df.columns = [c.strip().lower() for c in events_df.columns]
     print("DEBUG events_df.columns:", list(events_df.columns))
 
-    required_cols = {
-        "student_id",
-        "name",
-        "email",
-        "company_or_organizer",
-        "event_type",
-        "event_date",
-        "result",
-    }
-    missing = required_cols - set(events_df.columns)
+    missing = EVENT_REQUIRED_COLUMNS - set(events_df.columns)
     if missing:
         raise HTTPException(
             status_code=400,
@@ -392,46 +543,98 @@ async def upload_events(file: UploadFile = File(...)):
     print("DEBUG attendance_df.columns:", list(attendance_df.columns))
 
     if attendance_df.empty:
-        response = {
-            "rows": 0,
-            "matched_count": 0,
-            "unmatched_count": 0,
-            "data": [],
-        }
-        return jsonable_encoder(response)
-
-    # Copy for storage
-    log_to_store = attendance_df.copy()
-
-    # Clean for JSON
-    attendance_df = attendance_df.astype(object)
-    attendance_df = attendance_df.where(pd.notnull(attendance_df), None)
-
-    if "matched" in attendance_df.columns:
-        matched_count = int(attendance_df["matched"].sum())
-        unmatched_count = int((~attendance_df["matched"]).sum())
+        matched_count = unmatched_count = 0
+        fingerprints = []
     else:
-        matched_count = 0
-        unmatched_count = len(attendance_df)
+        if "matched" in attendance_df.columns:
+            matched = attendance_df["matched"].astype(bool)
+            matched_count = int(matched.sum())
+            unmatched_count = int((~matched).sum())
+        else:
+            matched_count = 0
+            unmatched_count = len(attendance_df)
+        fingerprints = attendance_df["fingerprint_hash"].tolist()
 
-    # Persist (de-dup by fingerprint_hash inside save_attendance_log)
-    save_attendance_log(log_to_store)
+        # Persist (de-dup by fingerprint_hash inside save_attendance_log)
+        save_attendance_log(attendance_df.copy())
 
-    response = {
+    summary = {
         "rows": int(len(attendance_df)),
         "matched_count": matched_count,
         "unmatched_count": unmatched_count,
-        "data": attendance_df.to_dict(orient="records"),
     }
 
+    # the summary covers the whole file, so fold in what the prefix already
+    # had; fingerprints stay per upload and link back to the prefix entry
+    file_summary = dict(summary)
+    if prior is not None:
+        for k in file_summary:
+            file_summary[k] += int(prior["summary"].get(k, 0))
+    record_upload(
+        content,
+        filename,
+        row_count=(prior["row_count"] if prior is not None else 0) + len(events_df),
+        summary=file_summary,
+        fingerprints=fingerprints,
+        prior=prior["sha256"] if prior is not None else None,
+    )
+
+    response = {
+        **summary,
+        "cached": False,
+        "data": rows_payload([], fmt),
+    }
+    if prior is not None:
+        response["appended_to"] = prior["sha256"]
+        response["skipped_rows"] = int(prior["row_count"])
+
+    if not attendance_df.empty:
+        # Clean for JSON
+        attendance_df = attendance_df.astype(object)
+        attendance_df = attendance_df.where(pd.notnull(attendance_df), None)
+        response["data"] = rows_payload(attendance_df, fmt)
+
     return jsonable_encoder(response)
 
+@app.post("/api/upload_events_bulk")
+async def upload_events_bulk(files: list[UploadFile] = File(...)):
+    """
+    Upload many events CSVs and/or .zip archives of CSVs at once.
+    Files are parsed and matched in parallel and written to the log together.
+    """
+    inputs = []
+    for f in files:
+        filename = f.filename or ""
+        if not filename.lower().endswith((".csv", ".zip")):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Only .csv or .zip files are supported ({filename})",
+            )
+        inputs.append((filename, await f.read()))
+
+    try:
+        result = await run_in_threadpool(ingest_files, inputs)
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return jsonable_encoder(result)
+
+def _last_row(series: pd.Series):
+    # value of the last row, even if null (unlike pandas "last")
+    return series.iloc[-1] if len(series) else None
+
+
+def _str_or_none(value):
+    return None if value is None else str(value)
+
+
 @app.get("/api/classes/{class_id}/students")
-def api_class_students(class_id: str):
+def api_class_students(class_id: str, fmt: str = Query("json", alias="format")):
     """
     Return all students belonging to a given class_id
     from students_master.csv, plus per-student placement summary.
     """
+    fmt = _wire_format(fmt)
     try:
         students_df = load_students()
     except FileNotFoundError:
@@ -441,7 +644,7 @@ def api_class_students(class_id: str):
         )
 
     if students_df is None or students_df.empty:
-        return jsonable_encoder({"rows": 0, "data": []})
+        return jsonable_encoder({"rows": 0, "data": rows_payload([], fmt)})
 
     students_df = students_df.copy()
     students_df.columns = [c.strip().lower() for c in students_df.columns]
@@ -460,92 +663,45 @@ def api_class_students(class_id: str):
     subset = students_df[students_df["class_id"] == cid].copy()
 
     if subset.empty:
-        return jsonable_encoder({"rows": 0, "data": []})
+        return jsonable_encoder({"rows": 0, "data": rows_payload([], fmt)})
 
-    # ---- load attendance log & build per-student stats ----
-    log_df = load_attendance_log()
-    if log_df is not None and not log_df.empty:
-        log_df = log_df.copy()
-        log_df.columns = [c.strip().lower() for c in log_df.columns]
-        if "student_id" in log_df.columns:
-            log_df["student_id"] = log_df["student_id"].astype(str).str.strip()
-        else:
-            log_df = None
-    else:
-        log_df = None
-
-    # create extra columns on subset
-    subset["total_events"] = 0
-    subset["placements"] = 0
-    subset["internships"] = 0
-    subset["trainings"] = 0
-    subset["max_lpa"] = None
-    subset["last_company"] = None
-    subset["last_result"] = None
-
-    if log_df is not None:
-        # we only care about events for these students
-        class_student_ids = set(subset["student_id"].tolist())
-        log_subset = log_df[log_df["student_id"].isin(class_student_ids)].copy()
-
-        if not log_subset.empty:
-            # normalize helper columns
-            if "event_type" in log_subset.columns:
-                log_subset["event_type_norm"] = (
-                    log_subset["event_type"].astype(str).str.lower()
-                )
-            else:
-                log_subset["event_type_norm"] = ""
-
-            if "result" in log_subset.columns:
-                log_subset["result_norm"] = (
-                    log_subset["result"].astype(str).str.lower()
-                )
-            else:
-                log_subset["result_norm"] = ""
-
-            # loop students and fill stats
-            for idx, row in subset.iterrows():
-                sid = row["student_id"]
-                s_events = log_subset[log_subset["student_id"] == sid]
-
-                if s_events.empty:
-                    continue
-
-                etype = s_events["event_type_norm"]
-                result = s_events["result_norm"]
-
-                placed = s_events[(etype == "placement") & (result == "selected")]
-                internship = s_events[(etype == "internship") & (result == "selected")]
-                training = s_events[(etype == "training")]
-
-                subset.at[idx, "total_events"] = int(len(s_events))
-                subset.at[idx, "placements"] = int(len(placed))
-                subset.at[idx, "internships"] = int(len(internship))
-                subset.at[idx, "trainings"] = int(len(training))
-
-                # max LPA (numeric)
-                max_lpa = None
-                if "lpa" in s_events.columns:
-                    try:
-                        lpa_vals = pd.to_numeric(
-                            s_events["lpa"], errors="coerce"
-                        )
-                        if lpa_vals.notna().any():
-                            max_lpa = float(lpa_vals.max())
-                    except Exception:
-                        max_lpa = None
-                subset.at[idx, "max_lpa"] = max_lpa
-
-                # "last" company / result (by row order)
-                last = s_events.dropna(subset=["company"]).tail(1)
-                if not last.empty:
-                    subset.at[idx, "last_company"] = str(
-                        last["company"].iloc[0]
-                    )
-                    subset.at[idx, "last_result"] = str(
-                        last["result"].iloc[0]
-                    )
+    # ---- per-student stats from the attendance log ----
+    events = attendance_log().where_in("student_id", subset["student_id"].tolist())
+    by_student = events.group_by("student_id")
+
+    totals = by_student.agg(
+        total_events=("attendance_id", "size"),
+        max_lpa=("lpa_num", "max"),
+    )
+    placements = by_student.where(
+        event_type_norm="placement", result_norm="selected"
+    ).agg(n=("attendance_id", "size"))
+    internships = by_student.where(
+        event_type_norm="internship", result_norm="selected"
+    ).agg(n=("attendance_id", "size"))
+    trainings = by_student.where(event_type_norm="training").agg(
+        n=("attendance_id", "size")
+    )
+    # "last" company / result: latest event_date; undated rows sort first
+    # so dated events win, ties keep row order
+    last = (
+        events.where_notna("company")
+        .order_by("event_date")
+        .group_by("student_id")
+        .agg(company=("company", _last_row), result=("result", _last_row))
+    )
+
+    def stat(table, sid, key="n", default=0):
+        return table.get(sid, {}).get(key, default)
+
+    sids = subset["student_id"]
+    subset["total_events"] = [stat(totals, sid, "total_events") for sid in sids]
+    subset["placements"] = [stat(placements, sid) for sid in sids]
+    subset["internships"] = [stat(internships, sid) for sid in sids]
+    subset["trainings"] = [stat(trainings, sid) for sid in sids]
+    subset["max_lpa"] = [stat(totals, sid, "max_lpa", None) for sid in sids]
+    subset["last_company"] = [_str_or_none(stat(last, sid, "company", None)) for sid in sids]
+    subset["last_result"] = [_str_or_none(stat(last, sid, "result", None)) for sid in sids]
 
     # Clean for JSON
     subset = subset.astype(object)
@@ -554,38 +710,25 @@ def api_class_students(class_id: str):
     return jsonable_encoder(
         {
             "rows": int(len(subset)),
-            "data": subset.to_dict(orient="records"),
+            "data": rows_payload(subset, fmt),
         }
     )
 
 
 # ========= UNMATCHED QUEUE =========
 @app.get("/api/unmatched")
-def api_unmatched():
+def api_unmatched(fmt: str = Query("json", alias="format")):
     """
     Return all unmatched attendance rows from the persistent log.
     This is your admin review queue.
     """
-    log_df = load_attendance_log()
-
-    if log_df is None or log_df.empty:
-        return jsonable_encoder({"rows": 0, "data": []})
-
-    if "matched" not in log_df.columns:
-        return jsonable_encoder({"rows": 0, "data": []})
-
-    unmatched = log_df[log_df["matched"] == False]  # noqa: E712
-
-    if unmatched.empty:
-        return jsonable_encoder({"rows": 0, "data": []})
-
-    unmatched = unmatched.astype(object)
-    unmatched = unmatched.where(pd.notnull(unmatched), None)
+    fmt = _wire_format(fmt)
+    unmatched = json_safe(attendance_log().where(matched=False).collect())
 
     return jsonable_encoder(
         {
             "rows": int(len(unmatched)),
-            "data": unmatched.to_dict(orient="records"),
+            "data": rows_payload(unmatched, fmt),
         }
     )
 
@@ -610,15 +753,25 @@ async def api_resolve_match(body: ResolveMatchRequest):
     if not mask.any():
         raise HTTPException(status_code=400, detail=f"No row found with attendance_id={target_id}")
 
+    old_class_id = log_df.loc[mask, "class_id"].iloc[0] if "class_id" in log_df.columns else None
+
+    # keep class_id in step with the chosen student when we know them
+    students_df = load_students()
+    student_mask = students_df["student_id"].astype(str).str.strip() == str(body.student_id).strip()
+    if student_mask.any():
+        log_df["class_id"] = log_df["class_id"].astype(object)
+        log_df.loc[mask, "class_id"] = students_df[student_mask].iloc[0]["class_id"]
+
     log_df.loc[mask, "student_id"] = body.student_id
     log_df.loc[mask, "matched"] = True
     log_df.loc[mask, "match_status"] = "MANUAL"
     log_df.loc[mask, "match_score"] = 100
 
-    log_df.to_csv(ATTENDANCE_LOG_PATH, index=False)
+    update_attendance_rows(log_df.loc[mask])
 
     updated_row = log_df.loc[mask].iloc[0].astype(object).where(
         pd.notnull(log_df.loc[mask].iloc[0]), None).to_dict()
+    publish_row_resolved(jsonable_encoder(updated_row), old_class_id)
 
     return jsonable_encoder(updated_row)
 
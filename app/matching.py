@@ -8,6 +8,25 @@ def norm_str(x):
     return str(x).strip().lower()
 
 
+def identity_str(x):
+    """
+    An uploaded id / phone as text. pandas reads a numeric column with
+    blanks as float, so 9000000001.0 becomes "9000000001" again.
+    Missing / blank values -> None.
+    """
+    if pd.isna(x):
+        return None
+    s = str(x).strip()
+    if s.endswith(".0") and s[:-2].isdigit():
+        s = s[:-2]
+    return s or None
+
+
+def norm_key(x):
+    # match key for ids / phones: identity_str, lower-cased, "" if missing
+    return (identity_str(x) or "").lower()
+
+
 def load_students() -> pd.DataFrame:
     df = pd.read_csv("data/students_master.csv")
     df.columns = [c.strip().lower() for c in df.columns]
@@ -27,9 +46,9 @@ def build_lookup(students_df: pd.DataFrame):
     lookup_name = {}
 
     for _, row in students_df.iterrows():
-        sid = norm_str(row.get("student_id"))
+        sid = norm_key(row.get("student_id"))
         email = norm_str(row.get("email"))
-        phone = norm_str(row.get("phone"))
+        phone = norm_key(row.get("phone"))
         name = norm_str(row.get("name"))
 
         if sid:
@@ -61,7 +80,7 @@ def make_fingerprint(row) -> str:
 
 def match_student(row, lookup_id, lookup_email, lookup_phone, lookup_name):
     # 1) student_id
-    sid = norm_str(row.get("student_id"))
+    sid = norm_key(row.get("student_id"))
     if sid and sid in lookup_id:
         return lookup_id[sid], "MATCHED_BY_ID", 100
 
@@ -71,7 +90,7 @@ def match_student(row, lookup_id, lookup_email, lookup_phone, lookup_name):
         return lookup_email[email], "MATCHED_BY_EMAIL", 95
 
     # 3) phone (if present)
-    phone = norm_str(row.get("phone"))
+    phone = norm_key(row.get("phone"))
     if phone and phone in lookup_phone:
         return lookup_phone[phone], "MATCHED_BY_PHONE", 90
 
@@ -0,0 +1,233 @@
+from collections import OrderedDict
+from pathlib import Path
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from fastapi import Header, HTTPException
+
+# Base dir = project root (place_modle)
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+
+# SESSION_BACKEND=sqlite keeps sessions in data/sessions.db so they survive
+# restarts and are shared by all worker processes; default is in-memory.
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = Path(os.environ.get("SESSION_DB_PATH", DATA_DIR / "sessions.db"))
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", 8 * 60 * 60))
+SESSION_MAX = int(os.environ.get("SESSION_MAX", 10_000))
+
+# sqlite: refresh last_seen at most this often per session
+TOUCH_INTERVAL_SECONDS = 60
+
+
+class MemorySessionStore:
+    """
+    token -> session dict, in least-recently-used order.
+
+    - validate(): one dict lookup + move_to_end, O(1)
+    - expired sessions are dropped when seen and swept from the LRU end
+    - at most `max_sessions`; the least recently used one is evicted
+    """
+
+    def __init__(self, ttl_seconds: int = SESSION_TTL_SECONDS, max_sessions: int = SESSION_MAX):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.sessions: OrderedDict[str, dict] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def create(self, email: str, role: str) -> dict:
+        now = time.time()
+        session = {
+            "token": str(uuid.uuid4()),
+            "email": email,
+            "role": role,
+            "created_at": now,
+            "expires_at": now + self.ttl_seconds,
+        }
+        with self.lock:
+            self.sessions[session["token"]] = session
+            self._sweep(now)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        return session
+
+    def validate(self, token: str) -> dict | None:
+        now = time.time()
+        with self.lock:
+            session = self.sessions.get(token)
+            if session is None:
+                return None
+            if session["expires_at"] <= now:
+                del self.sessions[token]
+                return None
+            self.sessions.move_to_end(token)
+            return session
+
+    def revoke(self, token: str) -> None:
+        with self.lock:
+            self.sessions.pop(token, None)
+
+    def _sweep(self, now: float, limit: int = 100) -> None:
+        # caller holds the lock; least recently used sessions sit at the front
+        for _ in range(limit):
+            if not self.sessions:
+                return
+            token, session = next(iter(self.sessions.items()))
+            if session["expires_at"] > now:
+                return
+            del self.sessions[token]
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+
+class SqliteSessionStore:
+    """
+    Same interface, backed by a SQLite file (WAL mode) so sessions
+    survive restarts and every worker process sees the same set.
+    Lookups go through the token primary key.
+    """
+
+    def __init__(
+        self,
+        path: Path = SESSION_DB_PATH,
+        ttl_seconds: int = SESSION_TTL_SECONDS,
+        max_sessions: int = SESSION_MAX,
+    ):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.local = threading.local()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    token TEXT PRIMARY KEY,
+                    email TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_seen REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def create(self, email: str, role: str) -> dict:
+        now = time.time()
+        session = {
+            "token": str(uuid.uuid4()),
+            "email": email,
+            "role": role,
+            "created_at": now,
+            "expires_at": now + self.ttl_seconds,
+        }
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?)",
+                (session["token"], email, role, now, session["expires_at"], now),
+            )
+            conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            conn.execute(
+                """
+                DELETE FROM sessions WHERE token IN (
+                    SELECT token FROM sessions ORDER BY last_seen DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_sessions,),
+            )
+        return session
+
+    def validate(self, token: str) -> dict | None:
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT token, email, role, created_at, expires_at, last_seen FROM sessions WHERE token = ?",
+            (token,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        token, email, role, created_at, expires_at, last_seen = row
+        if expires_at <= now:
+            self.revoke(token)
+            return None
+        if now - last_seen > TOUCH_INTERVAL_SECONDS:
+            with conn:
+                conn.execute("UPDATE sessions SET last_seen = ? WHERE token = ?", (now, token))
+
+        return {
+            "token": token,
+            "email": email,
+            "role": role,
+            "created_at": created_at,
+            "expires_at": expires_at,
+        }
+
+    def revoke(self, token: str) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def make_session_store(backend: str = SESSION_BACKEND):
+    if backend == "sqlite":
+        return SqliteSessionStore()
+    if backend == "memory":
+        return MemorySessionStore()
+    raise ValueError(f"SESSION_BACKEND must be 'memory' or 'sqlite', got {backend!r}")
+
+
+SESSIONS = make_session_store()
+
+
+def get_session(authorization: str | None = Header(default=None)) -> dict:
+    """
+    FastAPI dependency: the caller's session from "Authorization: Bearer <token>".
+
+        @app.get("/api/me")
+        def api_me(session: dict = Depends(get_session)): ...
+    """
+    token = None
+    if authorization:
+        scheme, _, value = authorization.partition(" ")
+        if scheme.lower() == "bearer":
+            token = value.strip()
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+
+    session = SESSIONS.validate(token)
+    if session is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    return session
+
+
+def require_admin(authorization: str | None = Header(default=None)) -> dict:
+    """
+    FastAPI dependency: like get_session, but only for role=admin.
+    """
+    session = get_session(authorization)
+    if session["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin role required")
+    return session
@@ -0,0 +1,276 @@
+from bisect import bisect_left, insort
+from pathlib import Path
+import re
+import threading
+
+import pandas as pd
+
+from app.matching import norm_str, load_students
+
+# Base dir = project root (place_modle)
+BASE_DIR = Path(__file__).resolve().parent.parent
+STUDENTS_MASTER_PATH = BASE_DIR / "data" / "students_master.csv"
+
+SEARCH_FIELDS = ["student_id", "name", "email", "phone", "class_id"]
+
+_SPLIT_RE = re.compile(r"[\s@._\-+]+")
+
+
+def _tokens(record: dict) -> set[str]:
+    """
+    Searchable tokens of one student: the full id / email / phone,
+    plus every word of the name and every piece of the email.
+    """
+    tokens = set()
+    for field in ("student_id", "email", "phone"):
+        value = record.get(field, "")
+        if value:
+            tokens.add(value)
+    for field in ("name", "email"):
+        tokens.update(t for t in _SPLIT_RE.split(record.get(field, "")) if t)
+    return tokens
+
+
+def _records(students_df: pd.DataFrame) -> dict[str, dict]:
+    """
+    student_id -> {display fields..., "_keys": lower-cased fields}
+    (first row wins for a repeated student_id).
+    """
+    df = students_df.copy()
+    df.columns = [c.strip().lower() for c in df.columns]
+    if "student_id" not in df.columns:
+        return {}
+
+    cols = df.reindex(columns=SEARCH_FIELDS).astype(object)
+    cols = cols.where(cols.notna(), "").astype(str)
+    cols = cols.apply(lambda col: col.str.strip())
+    # phones are read as floats when the column has blanks
+    cols["phone"] = cols["phone"].str.replace(r"\.0$", "", regex=True)
+
+    records = {}
+    for values in cols.itertuples(index=False, name=None):
+        record = dict(zip(SEARCH_FIELDS, values))
+        sid = record["student_id"]
+        if sid and sid not in records:
+            record["_keys"] = {k: v.lower() for k, v in zip(SEARCH_FIELDS, values)}
+            records[sid] = record
+    return records
+
+
+class _TokenIndex:
+    """
+    token -> sorted student_ids, plus all tokens in order so a
+    prefix is a bisect range.
+    """
+
+    def __init__(self):
+        self.tokens: dict[str, list[str]] = {}
+        self.sorted_tokens: list[str] = []
+
+    def add(self, sid: str, tokens, keep_sorted: bool = True) -> None:
+        for token in tokens:
+            ids = self.tokens.get(token)
+            if ids is None:
+                self.tokens[token] = [sid]
+                if keep_sorted:
+                    insort(self.sorted_tokens, token)
+            elif not keep_sorted:
+                # resort() puts it in place
+                ids.append(sid)
+            else:
+                i = bisect_left(ids, sid)
+                if i == len(ids) or ids[i] != sid:
+                    ids.insert(i, sid)
+
+    def remove(self, sid: str, tokens, keep_sorted: bool = True) -> None:
+        for token in tokens:
+            ids = self.tokens.get(token)
+            if ids is None:
+                continue
+            i = bisect_left(ids, sid)
+            if i < len(ids) and ids[i] == sid:
+                ids.pop(i)
+            if not ids:
+                del self.tokens[token]
+                if keep_sorted:
+                    j = bisect_left(self.sorted_tokens, token)
+                    if j < len(self.sorted_tokens) and self.sorted_tokens[j] == token:
+                        self.sorted_tokens.pop(j)
+
+    def resort(self) -> None:
+        for ids in self.tokens.values():
+            ids.sort()
+        self.sorted_tokens = sorted(self.tokens)
+
+    def range_size(self, prefix: str) -> int:
+        # number of distinct tokens starting with `prefix`
+        lo = bisect_left(self.sorted_tokens, prefix)
+        hi = bisect_left(self.sorted_tokens, prefix + "\uffff")
+        return hi - lo
+
+    def walk(self, prefix: str):
+        """
+        student_ids of every token starting with `prefix`, in token
+        order (ids within a token in id order); may repeat ids.
+        """
+        i = bisect_left(self.sorted_tokens, prefix)
+        while i < len(self.sorted_tokens):
+            token = self.sorted_tokens[i]
+            if not token.startswith(prefix):
+                return
+            i += 1
+            yield from self.tokens[token]
+
+
+class StudentSearchIndex:
+    """
+    In-memory token + prefix index over the students master.
+
+    - everyone: _TokenIndex over all students
+    - by_class: one _TokenIndex per class_id, so a class-scoped query
+      only walks that class's tokens
+
+    sync() applies only the differences to a new master, so student
+    uploads don't rebuild the whole index.
+    """
+
+    def __init__(self):
+        self.records: dict[str, dict] = {}
+        self.everyone = _TokenIndex()
+        self.by_class: dict[str, _TokenIndex] = {}
+        self.source_mtime: float | None = None
+        self.lock = threading.Lock()
+
+    # ---- maintenance ----
+    # above this many changed students, re-sort the token lists once
+    # instead of inserting / popping one token at a time
+    BULK_THRESHOLD = 500
+
+    def _add(self, sid: str, record: dict, keep_sorted: bool = True) -> None:
+        record["_tokens"] = tuple(sorted(_tokens(record["_keys"])))
+        self.records[sid] = record
+        self.everyone.add(sid, record["_tokens"], keep_sorted)
+        cid = record["_keys"]["class_id"]
+        if cid:
+            self.by_class.setdefault(cid, _TokenIndex()).add(sid, record["_tokens"], keep_sorted)
+
+    def _remove(self, sid: str, keep_sorted: bool = True) -> None:
+        record = self.records.pop(sid, None)
+        if record is None:
+            return
+        self.everyone.remove(sid, record["_tokens"], keep_sorted)
+        cid = record["_keys"]["class_id"]
+        index = self.by_class.get(cid)
+        if index is not None:
+            index.remove(sid, record["_tokens"], keep_sorted)
+            if not index.tokens:
+                del self.by_class[cid]
+
+    def sync(self, students_df: pd.DataFrame, mtime: float | None = None) -> dict:
+        """
+        Bring the index in line with `students_df`, touching only
+        inserted / changed / deleted students.
+        """
+        incoming = _records(students_df)
+
+        with self.lock:
+            deleted = [sid for sid in self.records if sid not in incoming]
+            changed = [
+                sid
+                for sid, record in incoming.items()
+                if _public(self.records.get(sid)) != _public(record)
+            ]
+            keep_sorted = len(deleted) + len(changed) <= self.BULK_THRESHOLD
+            for sid in deleted:
+                self._remove(sid, keep_sorted)
+            for sid in changed:
+                self._remove(sid, keep_sorted)
+                self._add(sid, incoming[sid], keep_sorted)
+            if not keep_sorted:
+                self.everyone.resort()
+                for index in self.by_class.values():
+                    index.resort()
+            self.source_mtime = mtime
+
+        return {"changed": len(changed), "deleted": len(deleted)}
+
+    # ---- lookup ----
+    def search(self, q: str, class_id: str | None = None, limit: int = 20) -> list[dict]:
+        """
+        Every whitespace-separated term must prefix-match some token
+        (name word, email / email part, phone, student_id).
+
+        The term with the narrowest token range drives a walk over that
+        range (within the class's own index when class_id is given), so
+        results come back in token order and the walk stops once `limit`
+        students are found, however broad the prefix.
+        """
+        terms = {t for t in norm_str(q).split() if t}
+        if not terms or limit <= 0:
+            return []
+
+        results = []
+        with self.lock:
+            if class_id:
+                index = self.by_class.get(norm_str(class_id))
+                if index is None:
+                    return []
+            else:
+                index = self.everyone
+
+            # ties go to the longer term, then alphabetical, for stable order
+            ordered = sorted(terms, key=lambda t: (index.range_size(t), -len(t), t))
+            driver, others = ordered[0], ordered[1:]
+
+            seen = set()
+            for sid in index.walk(driver):
+                if sid in seen:
+                    continue
+                seen.add(sid)
+                record = self.records[sid]
+                if others:
+                    own = record["_tokens"]
+                    if not all(any(t.startswith(o) for t in own) for o in others):
+                        continue
+                results.append(_public(record))
+                if len(results) >= limit:
+                    break
+
+        return results
+
+
+def _public(record: dict | None) -> dict | None:
+    if record is None:
+        return None
+    return {k: v for k, v in record.items() if not k.startswith("_")}
+
+
+SEARCH_INDEX = StudentSearchIndex()
+
+
+def _master_mtime() -> float | None:
+    try:
+        return STUDENTS_MASTER_PATH.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def get_search_index() -> StudentSearchIndex:
+    """
+    The shared index, synced from students_master.csv if the file
+    changed since the last sync (e.g. edited outside the API).
+    Raises FileNotFoundError if the master is missing, like load_students().
+    """
+    mtime = _master_mtime()
+    if mtime is None:
+        raise FileNotFoundError(STUDENTS_MASTER_PATH)
+    if mtime != SEARCH_INDEX.source_mtime:
+        SEARCH_INDEX.sync(load_students(), mtime=mtime)
+    return SEARCH_INDEX
+
+
+def refresh_search_index(students_df: pd.DataFrame) -> dict:
+    """
+    Apply a just-written students master to the index.
+    """
+    return SEARCH_INDEX.sync(students_df, mtime=_master_mtime())
@@ -0,0 +1,171 @@
+import pandas as pd
+
+from app.matching import norm_str, norm_key, build_lookup, match_student
+
+
+def _normalize_students(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df.columns = [c.strip().lower() for c in df.columns]
+    df["student_id"] = df["student_id"].astype(str).str.strip()
+    df = df.drop_duplicates(subset=["student_id"])
+    return df
+
+
+def _student_keys(rows: pd.DataFrame) -> set[str]:
+    """
+    All normalized match keys (id / email / phone / name) of the given students.
+    """
+    keys = set()
+    for col in ("student_id", "email", "phone", "name"):
+        if col in rows.columns:
+            keys.update(norm_key(v) for v in rows[col])
+    keys.discard("")
+    return keys
+
+
+def diff_students(old_df: pd.DataFrame | None, new_df: pd.DataFrame) -> dict:
+    """
+    Diff an uploaded master against the current one by student_id.
+
+    Returns:
+      - inserted / updated / deleted: lists of student_ids
+      - merged: the new master (existing order kept, inserts appended)
+    """
+    new_df = _normalize_students(new_df)
+
+    if old_df is None or old_df.empty:
+        return {
+            "inserted": new_df["student_id"].tolist(),
+            "updated": [],
+            "deleted": [],
+            "merged": new_df,
+        }
+
+    old_df = _normalize_students(old_df)
+
+    old_ids = old_df["student_id"].tolist()
+    new_ids = new_df["student_id"].tolist()
+    old_set, new_set = set(old_ids), set(new_ids)
+
+    inserted = [sid for sid in new_ids if sid not in old_set]
+    deleted = [sid for sid in old_ids if sid not in new_set]
+
+    # compare every column as normalized text so 9876543210 == "9876543210" == 9876543210.0
+    columns = sorted(set(old_df.columns) | set(new_df.columns))
+    old_cmp = old_df.set_index("student_id").reindex(columns=columns)
+    new_cmp = new_df.set_index("student_id").reindex(columns=columns)
+    common = [sid for sid in old_ids if sid in new_set]
+    old_cmp = old_cmp.loc[common].map(norm_key)
+    new_cmp = new_cmp.loc[common].map(norm_key)
+    changed = (old_cmp != new_cmp).any(axis=1)
+    updated = changed[changed].index.tolist()
+
+    ordered = common + inserted
+    merged = new_df.set_index("student_id").loc[ordered].reset_index()
+
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "deleted": deleted,
+        "merged": merged,
+    }
+
+
+def rematch_affected(log_df: pd.DataFrame, diff: dict) -> tuple[pd.DataFrame, dict]:
+    """
+    Re-run matching only on attendance rows touched by a student diff:
+
+      - rows pointing at an updated / deleted student
+      - non-manual rows whose uploaded id / email / phone / name now hits
+        an inserted or updated student
+
+    MANUAL rows keep their student; they only get a fresh class_id
+    (or drop back to UNMATCHED if that student was deleted).
+    Rows logged before identity columns were stored can't be re-matched,
+    so they are treated the same way as MANUAL rows.
+    """
+    stats = {"candidates": 0, "rematched": 0, "class_changed": 0, "class_ids": set()}
+    if log_df is None or log_df.empty:
+        return log_df, stats
+
+    merged = diff["merged"]
+    changed_ids = set(diff["updated"]) | set(diff["deleted"])
+    touched = merged[merged["student_id"].isin(set(diff["inserted"]) | set(diff["updated"]))]
+    new_keys = _student_keys(touched)
+
+    if not changed_ids and not new_keys:
+        return log_df, stats
+
+    log_df = log_df.copy()
+    for col in ("student_id", "class_id", "match_status"):
+        log_df[col] = log_df[col].astype(object)
+    input_cols = ["input_student_id", "input_email", "input_phone", "input_name"]
+    for col in input_cols:
+        if col not in log_df.columns:
+            log_df[col] = None
+
+    current_sid = log_df["student_id"].map(norm_str)
+    changed_norm = {norm_str(s) for s in changed_ids}
+    points_at_changed = current_sid.isin(changed_norm)
+
+    input_norm = log_df[input_cols].map(norm_key)
+    hits_new_key = input_norm.isin(new_keys).any(axis=1)
+    has_input = (input_norm != "").any(axis=1)
+    manual = log_df["match_status"].astype(str) == "MANUAL"
+
+    rematch_mask = ~manual & has_input & (points_at_changed | hits_new_key)
+    refresh_mask = (manual | ~has_input) & points_at_changed
+    stats["candidates"] = int(rematch_mask.sum() + refresh_mask.sum())
+    if stats["candidates"] == 0:
+        return log_df, stats
+
+    lookup_id, lookup_email, lookup_phone, lookup_name = build_lookup(merged)
+    by_id = merged.set_index("student_id")
+
+    for idx in log_df.index[rematch_mask]:
+        row = log_df.loc[idx]
+        probe = {
+            "student_id": row["input_student_id"],
+            "email": row["input_email"],
+            "phone": row["input_phone"],
+            "name": row["input_name"],
+        }
+        student_row, status, score = match_student(
+            probe, lookup_id, lookup_email, lookup_phone, lookup_name
+        )
+        new_sid = student_row["student_id"] if student_row is not None else None
+        new_cid = student_row["class_id"] if student_row is not None else None
+
+        if norm_str(row["class_id"]) != norm_str(new_cid):
+            stats["class_changed"] += 1
+            stats["class_ids"].update([row["class_id"], new_cid])
+        if (
+            norm_str(row["student_id"]) != norm_str(new_sid)
+            or row["match_status"] != status
+        ):
+            stats["rematched"] += 1
+
+        log_df.at[idx, "student_id"] = new_sid
+        log_df.at[idx, "class_id"] = new_cid
+        log_df.at[idx, "matched"] = status != "UNMATCHED"
+        log_df.at[idx, "match_status"] = status
+        log_df.at[idx, "match_score"] = score
+
+    for idx in log_df.index[refresh_mask]:
+        sid = str(log_df.at[idx, "student_id"]).strip()
+        if sid in by_id.index:
+            new_cid = by_id.at[sid, "class_id"]
+        else:
+            new_cid = None
+            log_df.at[idx, "student_id"] = None
+            log_df.at[idx, "matched"] = False
+            log_df.at[idx, "match_status"] = "UNMATCHED"
+            log_df.at[idx, "match_score"] = 0
+            stats["rematched"] += 1
+
+        if norm_str(log_df.at[idx, "class_id"]) != norm_str(new_cid):
+            stats["class_changed"] += 1
+            stats["class_ids"].update([log_df.at[idx, "class_id"], new_cid])
+        log_df.at[idx, "class_id"] = new_cid
+
+    return log_df, stats
@@ -0,0 +1,338 @@
+from pathlib import Path
+import pandas as pd
+
+from app.companies import canonical_company, canonicalize
+from app.ingest_journal import JOURNAL, atomic_write_csv
+
+# Base dir = project root (place_modle)
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+DATA_DIR.mkdir(exist_ok=True)
+
+ROLLUP_PATH = DATA_DIR / "trends_rollup.csv"
+
+# granularity -> pandas period frequency
+GRANULARITIES = {
+    "day": "D",
+    "week": "W-SUN",   # weeks start on Monday
+    "month": "M",
+}
+
+# dimension -> attendance_log column
+# (company buckets are stored per raw spelling and rolled up by
+# canonical company_id when queried, so alias edits apply at once)
+DIMENSIONS = {
+    "class": "class_id",
+    "company": "company",
+}
+
+ROLLUP_KEYS = ["granularity", "dimension", "key", "period_start"]
+ROLLUP_COLUMNS = ROLLUP_KEYS + [
+    "selections",
+    "offers",
+    "lpa_sum",
+    "lpa_count",
+    "lpa_max",
+]
+
+# in-memory copy of the rollup file: (mtime, DataFrame)
+_ROLLUP_CACHE: dict[str, tuple[float, pd.DataFrame]] = {}
+
+
+def _empty_rollups() -> pd.DataFrame:
+    return pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+
+def build_rollups(log_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregate attendance rows into daily / weekly / monthly buckets
+    per class and per company.
+
+    - selections: rows with result == selected (any event type)
+    - offers:     placement rows with result == selected
+    - lpa_*:      sum / count / max of LPA over offers
+                  (sum + count are stored so buckets stay mergeable)
+
+    Rows without a parseable event_date are skipped.
+    """
+    if log_df is None or log_df.empty or "event_date" not in log_df.columns:
+        return _empty_rollups()
+
+    df = log_df.copy()
+    df.columns = [c.strip().lower() for c in df.columns]
+    df["event_date"] = pd.to_datetime(df["event_date"], errors="coerce")
+    df = df[df["event_date"].notna()]
+    if df.empty:
+        return _empty_rollups()
+
+    etype = df["event_type"].astype(str).str.strip().str.lower()
+    result = df["result"].astype(str).str.strip().str.lower()
+
+    df["selections"] = (result == "selected").astype(int)
+    df["offers"] = ((etype == "placement") & (result == "selected")).astype(int)
+
+    if "lpa" in df.columns:
+        lpa = pd.to_numeric(df["lpa"], errors="coerce")
+    else:
+        lpa = pd.Series(float("nan"), index=df.index)
+    df["lpa_offer"] = lpa.where(df["offers"] == 1)
+
+    frames = []
+    for granularity, freq in GRANULARITIES.items():
+        period_start = df["event_date"].dt.to_period(freq).dt.start_time
+        for dimension, column in DIMENSIONS.items():
+            if column not in df.columns:
+                continue
+
+            keys = df[column].astype(str).str.strip()
+            valid = df[column].notna() & (keys != "")
+            if not valid.any():
+                continue
+
+            part = pd.DataFrame(
+                {
+                    "key": keys[valid],
+                    "period_start": period_start[valid],
+                    "selections": df.loc[valid, "selections"],
+                    "offers": df.loc[valid, "offers"],
+                    "lpa_offer": df.loc[valid, "lpa_offer"],
+                }
+            )
+            grouped = (
+                part.groupby(["key", "period_start"])
+                .agg(
+                    selections=("selections", "sum"),
+                    offers=("offers", "sum"),
+                    lpa_sum=("lpa_offer", "sum"),
+                    lpa_count=("lpa_offer", "count"),
+                    lpa_max=("lpa_offer", "max"),
+                )
+                .reset_index()
+            )
+            grouped["granularity"] = granularity
+            grouped["dimension"] = dimension
+            frames.append(grouped)
+
+    if not frames:
+        return _empty_rollups()
+
+    return pd.concat(frames, ignore_index=True)[ROLLUP_COLUMNS]
+
+
+def merge_rollups(base: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """
+    Combine two rollup tables bucket by bucket.
+    """
+    if base is None or base.empty:
+        return delta.copy()
+    if delta is None or delta.empty:
+        return base.copy()
+
+    return _combine(pd.concat([base, delta], ignore_index=True))
+
+
+def _combine(rollups: pd.DataFrame) -> pd.DataFrame:
+    # one row per bucket: counts and sums add up, max takes the max
+    return (
+        rollups.groupby(ROLLUP_KEYS)
+        .agg(
+            selections=("selections", "sum"),
+            offers=("offers", "sum"),
+            lpa_sum=("lpa_sum", "sum"),
+            lpa_count=("lpa_count", "sum"),
+            lpa_max=("lpa_max", "max"),
+        )
+        .reset_index()[ROLLUP_COLUMNS]
+    )
+
+
+def save_rollups(rollups: pd.DataFrame) -> None:
+    atomic_write_csv(rollups, ROLLUP_PATH)
+    _ROLLUP_CACHE.pop(str(ROLLUP_PATH), None)
+
+
+def _read_rollups() -> pd.DataFrame:
+    """
+    Read the rollup file, reusing the parsed copy while the file is unchanged.
+    """
+    mtime = ROLLUP_PATH.stat().st_mtime
+    cached = _ROLLUP_CACHE.get(str(ROLLUP_PATH))
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    df = pd.read_csv(ROLLUP_PATH, dtype={"key": str})
+    df["period_start"] = pd.to_datetime(df["period_start"], errors="coerce")
+    _ROLLUP_CACHE[str(ROLLUP_PATH)] = (mtime, df)
+    return df
+
+
+def load_rollups() -> pd.DataFrame:
+    """
+    Load the pre-aggregated rollups.
+    If they don't exist yet, build them once from the attendance log
+    (under the journal lock, so no write slips in between).
+    """
+    if ROLLUP_PATH.exists():
+        return _read_rollups()
+
+    from app.class_summary import load_attendance_log
+
+    with JOURNAL.locked():
+        if not ROLLUP_PATH.exists():
+            rebuild_rollups(load_attendance_log())
+    return _read_rollups()
+
+
+def update_rollups(new_log_df: pd.DataFrame) -> None:
+    """
+    Fold freshly appended attendance rows into the stored rollups.
+    """
+    if new_log_df is None or new_log_df.empty:
+        return
+    if not ROLLUP_PATH.exists():
+        # first write: load_rollups() will build from the full log later
+        return
+
+    save_rollups(merge_rollups(_read_rollups(), build_rollups(new_log_df)))
+
+
+def _bucket_keys(df: pd.DataFrame) -> dict[str, set]:
+    # dimension -> keys, normalized the way build_rollups stores them
+    keys = {}
+    for dimension, column in DIMENSIONS.items():
+        if column in df.columns:
+            values = df.loc[df[column].notna(), column].astype(str).str.strip()
+            keys[dimension] = set(values[values != ""])
+    return keys
+
+
+def refresh_rollups(log_df: pd.DataFrame, changed_df: pd.DataFrame) -> None:
+    """
+    Recompute only the class / company buckets touched by edited rows.
+    `changed_df` holds the rows before and after the edit, `log_df` the
+    full log after it.
+    """
+    if changed_df is None or changed_df.empty:
+        return
+    if not ROLLUP_PATH.exists():
+        return
+
+    affected = _bucket_keys(changed_df)
+    in_log = pd.Series(False, index=log_df.index)
+    for dimension, keys in affected.items():
+        column = DIMENSIONS[dimension]
+        if column in log_df.columns:
+            in_log |= log_df[column].astype(str).str.strip().isin(keys)
+    fresh = build_rollups(log_df[in_log])
+
+    def touched(rollups: pd.DataFrame) -> pd.Series:
+        mask = pd.Series(False, index=rollups.index)
+        for dimension, keys in affected.items():
+            mask |= (rollups["dimension"] == dimension) & rollups["key"].isin(keys)
+        return mask
+
+    stored = _read_rollups()
+    save_rollups(
+        pd.concat(
+            [stored[~touched(stored)], fresh[touched(fresh)]],
+            ignore_index=True,
+        )[ROLLUP_COLUMNS]
+    )
+
+
+def rebuild_rollups(log_df: pd.DataFrame) -> None:
+    """
+    Recompute all rollups from the full log
+    (first build, or after a journal replay).
+    """
+    save_rollups(build_rollups(log_df))
+
+
+def _by_company_id(rollups: pd.DataFrame) -> tuple[pd.DataFrame, dict]:
+    """
+    Merge company buckets whose raw keys are spellings of the same
+    company; returns the merged rows keyed by company_id and
+    {company_id: canonical name}.
+    """
+    if rollups.empty:
+        return rollups, {}
+    companies = canonicalize(rollups["key"])
+    valid = companies["company_id"].notna()
+    names = dict(zip(companies.loc[valid, "company_id"], companies.loc[valid, "company_name"]))
+    rollups = rollups[valid].assign(key=companies.loc[valid, "company_id"])
+    return _combine(rollups), names
+
+
+def query_trends(
+    granularity: str = "month",
+    dimension: str = "class",
+    key: str | None = None,
+    start: str | None = None,
+    end: str | None = None,
+) -> dict:
+    """
+    Answer a time-range query from the rollups.
+    Returns one series per key, each a list of period points.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(
+            f"granularity must be one of {', '.join(GRANULARITIES)}"
+        )
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"dimension must be one of {', '.join(DIMENSIONS)}")
+
+    start_ts = pd.to_datetime(start, errors="coerce") if start else None
+    end_ts = pd.to_datetime(end, errors="coerce") if end else None
+    if (start and pd.isna(start_ts)) or (end and pd.isna(end_ts)):
+        raise ValueError("start / end must be dates like YYYY-MM-DD")
+
+    rollups = load_rollups()
+    mask = (rollups["granularity"] == granularity) & (
+        rollups["dimension"] == dimension
+    )
+    rollups = rollups[mask]
+    names = {}
+    if dimension == "company":
+        rollups, names = _by_company_id(rollups)
+        if key is not None:
+            # any spelling or id of the company
+            resolved = canonical_company(key)
+            key = resolved[0] if resolved else str(key).strip()
+    mask = pd.Series(True, index=rollups.index)
+    if key is not None:
+        mask &= rollups["key"] == str(key).strip()
+    if start_ts is not None:
+        # include the bucket that contains `start`
+        bucket_start = start_ts.to_period(GRANULARITIES[granularity]).start_time
+        mask &= rollups["period_start"] >= bucket_start
+    if end_ts is not None:
+        mask &= rollups["period_start"] <= end_ts
+
+    data = rollups[mask].sort_values(["key", "period_start"])
+
+    series = []
+    for series_key, group in data.groupby("key", sort=True):
+        points = []
+        for _, row in group.iterrows():
+            lpa_count = int(row["lpa_count"])
+            points.append(
+                {
+                    "period_start": row["period_start"].date().isoformat(),
+                    "selections": int(row["selections"]),
+                    "offers": int(row["offers"]),
+                    "avg_lpa": float(row["lpa_sum"]) / lpa_count if lpa_count else None,
+                    "max_lpa": float(row["lpa_max"]) if pd.notna(row["lpa_max"]) else None,
+                }
+            )
+        entry = {"key": series_key, "points": points}
+        if dimension == "company":
+            entry["company"] = names.get(series_key)
+        series.append(entry)
+
+    return {
+        "granularity": granularity,
+        "dimension": dimension,
+        "start": start,
+        "end": end,
+        "series": series,
+    }
@@ -0,0 +1,171 @@
+from pathlib import Path
+from datetime import datetime, timezone
+import hashlib
+import json
+import threading
+
+try:
+    import fcntl  # POSIX only; elsewhere appends are serialized in-process
+except ImportError:
+    fcntl = None
+
+# Base dir = project root (place_modle)
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+DATA_DIR.mkdir(exist_ok=True)
+
+# one JSON entry per line, appended on every processed upload
+REGISTRY_PATH = DATA_DIR / "upload_registry.jsonl"
+
+_lock = threading.Lock()
+# parsed registry + how many bytes of the file it covers
+_cache = {"offset": 0, "entries": {}}
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _read_new_entries() -> None:
+    # caller holds _lock; picks up lines appended since the last read
+    # (by this process or another one)
+    try:
+        size = REGISTRY_PATH.stat().st_size
+    except FileNotFoundError:
+        _cache.update(offset=0, entries={})
+        return
+    if size < _cache["offset"]:
+        # file was replaced: start over
+        _cache.update(offset=0, entries={})
+    if size == _cache["offset"]:
+        return
+
+    with open(REGISTRY_PATH, "rb") as fh:
+        fh.seek(_cache["offset"])
+        chunk = fh.read(size - _cache["offset"])
+
+    end = chunk.rfind(b"\n") + 1
+    for line in chunk[:end].splitlines():
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            # a broken line only costs us the cache, never the upload
+            continue
+        if isinstance(entry, dict) and "sha256" in entry:
+            _cache["entries"][entry["sha256"]] = entry
+    _cache["offset"] += end
+
+
+def load_registry() -> dict:
+    """
+    sha256 -> {filename, size, row_count, uploaded_at, summary,
+               fingerprints, prior}
+
+    `fingerprints` holds only the rows this upload added; when the file
+    extended an earlier upload, `prior` is that upload's sha256 (see
+    file_fingerprints). The parsed registry is kept in memory and only
+    newly appended lines are read; callers get a shallow copy.
+    """
+    with _lock:
+        _read_new_entries()
+        return dict(_cache["entries"])
+
+
+def find_upload(registry: dict, content: bytes) -> dict | None:
+    """
+    Exact match: the same file bytes were uploaded before.
+    """
+    return registry.get(content_hash(content))
+
+
+def file_fingerprints(registry: dict, entry: dict) -> list[str]:
+    """
+    Fingerprints of every row of an uploaded file, following the chain
+    of earlier uploads it appended to.
+    """
+    chain = []
+    seen = set()
+    while entry is not None and entry["sha256"] not in seen:
+        seen.add(entry["sha256"])
+        chain.append(entry.get("fingerprints", []))
+        prior = entry.get("prior")
+        entry = registry.get(prior) if prior else None
+
+    fingerprints = []
+    for part in reversed(chain):
+        fingerprints.extend(part)
+    return fingerprints
+
+
+def find_prefix_upload(registry: dict, content: bytes) -> dict | None:
+    """
+    Find the largest earlier upload whose bytes are a prefix of `content`
+    (i.e. the new file only appends rows to it).
+    Each distinct prefix length is hashed once.
+    """
+    by_size: dict[int, list[dict]] = {}
+    for entry in registry.values():
+        size = int(entry.get("size", 0))
+        if 0 < size < len(content):
+            by_size.setdefault(size, []).append(entry)
+
+    for size in sorted(by_size, reverse=True):
+        # the earlier file must end on a row boundary
+        if content[size - 1:size] not in (b"\n", b"\r") and content[size:size + 1] not in (b"\n", b"\r"):
+            continue
+        prefix_hash = content_hash(content[:size])
+        for entry in by_size[size]:
+            if entry["sha256"] == prefix_hash:
+                return entry
+    return None
+
+
+def split_tail(content: bytes, prefix_size: int) -> bytes:
+    """
+    Header line of `content` + the bytes appended after an earlier upload,
+    so the tail can be parsed as a CSV of its own.
+    """
+    header_end = content.find(b"\n")
+    header = content[: header_end + 1] if header_end != -1 else content + b"\n"
+    tail = content[prefix_size:].lstrip(b"\r\n")
+    return header + tail
+
+
+def record_upload(
+    content: bytes,
+    filename: str,
+    row_count: int,
+    summary: dict,
+    fingerprints: list[str],
+    prior: str | None = None,
+) -> dict:
+    """
+    Register a processed file. `summary` / `row_count` cover the whole
+    file; `fingerprints` only the rows added on top of `prior`.
+    The entry is appended as one line, so concurrent uploads (and other
+    processes) never overwrite each other's entries.
+    """
+    entry = {
+        "sha256": content_hash(content),
+        "filename": filename,
+        "size": len(content),
+        "row_count": int(row_count),
+        "uploaded_at": datetime.now(timezone.utc).isoformat(),
+        "summary": summary,
+        "fingerprints": fingerprints,
+        "prior": prior,
+    }
+    line = (json.dumps(entry) + "\n").encode("utf-8")
+
+    with _lock:
+        with open(REGISTRY_PATH, "ab") as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                fh.write(line)
+                fh.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+        _read_new_entries()
+    return entry
@@ -0,0 +1,46 @@
+import pandas as pd
+
+# ?format= values accepted by the row-returning endpoints
+WIRE_FORMATS = ("json", "columnar")
+
+
+def check_format(fmt: str) -> str:
+    if fmt not in WIRE_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(WIRE_FORMATS)}")
+    return fmt
+
+
+def rows_payload(rows, fmt: str = "json"):
+    """
+    Shape a list of rows for the wire.
+
+    json:     [{"col": value, ...}, ...]           (default)
+    columnar: {"columns": [...], "values": [[...], ...]}
+              values[i] holds every row's value for columns[i], so
+              each column name is sent once instead of once per row.
+
+    `rows` is a JSON-clean DataFrame or a list of dicts.
+    """
+    if isinstance(rows, pd.DataFrame):
+        if fmt == "columnar":
+            return {
+                "columns": [str(c) for c in rows.columns],
+                "values": [rows[c].tolist() for c in rows.columns],
+            }
+        return rows.to_dict(orient="records")
+
+    rows = list(rows or [])
+    if fmt != "columnar":
+        return rows
+
+    columns: list[str] = []
+    seen = set()
+    for row in rows:
+        for key in row:
+            if key not in seen:
+                seen.add(key)
+                columns.append(key)
+    return {
+        "columns": columns,
+        "values": [[row.get(c) for row in rows] for c in columns],
+    }
@@ -10,6 +10,7 @@ import ClassDetailPage from "./pages/ClassDetailPage";
 import StudentTrackerPage from "./pages/StudentTrackerPage";
 import StudentDetailPage from "./pages/StudentDetailPage";
 import LoginPage from "./pages/LoginPage";
+import { logout } from "./api/client";
 
 // Simple auth guard that checks localStorage
 function RequireAuth({ children }: { children: JSX.Element }) {
@@ -92,7 +93,8 @@ export default function App() {
               cursor: "pointer",
               textAlign: "left",
             }}
-            onClick={() => {
+            onClick={async () => {
+              await logout();
               localStorage.removeItem("authToken");
               localStorage.removeItem("authEmail");
               localStorage.removeItem("authRole");
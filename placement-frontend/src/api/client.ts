@@ -33,12 +33,33 @@ export async function login(email: string, password: string): Promise<LoginResul
   return res.json();
 }
 
+// -------- LOGOUT --------
+// revokes the server-side session; local state is cleared by the caller
+export async function logout(): Promise<void> {
+  const token = localStorage.getItem("authToken");
+  if (!token) return;
+  try {
+    await fetch(`${API_BASE}/api/logout`, {
+      method: "POST",
+      headers: { Authorization: `Bearer ${token}` },
+    });
+  } catch {
+    // ignore: the session expires on its own
+  }
+}
+
 
 export type UploadEventsResponse = {
   rows: number;
   matched_count: number;
   unmatched_count: number;
   data: AttendanceRow[];
+
+  // same file uploaded before -> summary served from the upload registry
+  cached?: boolean;
+  // file extends an earlier upload -> only the appended rows were processed
+  appended_to?: string;
+  skipped_rows?: number;
 };
 
 export type ClassSummary = {
@@ -48,6 +69,9 @@ export type ClassSummary = {
   internship_count: number;
   trained_count: number;
   not_placed_count: number;
+  // bumped on the change feed whenever this class's aggregates change
+  version?: number;
+  epoch?: string; // server process the version belongs to
 };
 
 export type StudentRow = {
@@ -91,6 +115,30 @@ export type StudentProfile = {
   summary: StudentSummary;
 };
 
+/* ---------- Compact columnar rows ---------- */
+
+// ?format=columnar responses send { columns, values } instead of one
+// object per row; values[i] holds every row's value for columns[i].
+export type ColumnarRows = {
+  columns: string[];
+  values: unknown[][];
+};
+
+export function fromColumnar<T>(data: ColumnarRows | T[]): T[] {
+  if (Array.isArray(data)) return data;
+  const { columns, values } = data;
+  const n = values.length > 0 ? values[0].length : 0;
+  const rows: T[] = [];
+  for (let r = 0; r < n; r++) {
+    const row: Record<string, unknown> = {};
+    columns.forEach((c, i) => {
+      row[c] = values[i][r];
+    });
+    rows.push(row as T);
+  }
+  return rows;
+}
+
 /* ---------- Events CSV upload ---------- */
 
 export async function uploadEventsCsv(
@@ -112,15 +160,72 @@ export async function uploadEventsCsv(
   return res.json();
 }
 
+/* ---------- Bulk events upload (many CSVs / .zip) ---------- */
+
+export type BulkFileResult = {
+  filename: string;
+  rows?: number;
+  matched_count?: number;
+  unmatched_count?: number;
+  cached?: boolean;
+  duplicate_in_batch?: boolean;
+  error?: string;
+};
+
+export type UploadEventsBulkResponse = {
+  files: BulkFileResult[];
+  files_processed: number;
+  files_cached: number;
+  files_failed: number;
+  rows: number;
+  matched_count: number;
+  unmatched_count: number;
+  rows_added: number;
+  workers: number;
+};
+
+export async function uploadEventsBulk(
+  files: File[]
+): Promise<UploadEventsBulkResponse> {
+  const formData = new FormData();
+  files.forEach((f) => formData.append("files", f));
+
+  const res = await fetch(`${API_BASE}/api/upload_events_bulk`, {
+    method: "POST",
+    body: formData,
+  });
+
+  if (!res.ok) {
+    const text = await res.text();
+    throw new Error(`Bulk upload failed: ${res.status} ${text}`);
+  }
+
+  return res.json();
+}
+
 /* ---------- Students master upload ---------- */
 
+export type UploadStudentsResponse = {
+  rows: number;
+  path: string;
+
+  // only in upsert mode:
+  inserted?: number;
+  updated?: number;
+  deleted?: number;
+  log_rows_checked?: number;
+  log_rows_rematched?: number;
+  log_rows_class_changed?: number;
+};
+
 export async function uploadStudentsCsv(
-  file: File
-): Promise<{ rows: number; path: string }> {
+  file: File,
+  mode: "replace" | "upsert" = "replace"
+): Promise<UploadStudentsResponse> {
   const form = new FormData();
   form.append("file", file);
 
-  const res = await fetch(`${API_BASE}/api/upload_students`, {
+  const res = await fetch(`${API_BASE}/api/upload_students?mode=${mode}`, {
     method: "POST",
     body: form,
   });
@@ -155,7 +260,7 @@ export async function getClassStudents(
   classId: string
 ): Promise<StudentRow[]> {
   const res = await fetch(
-    `${API_BASE}/api/classes/${encodeURIComponent(classId)}/students`,
+    `${API_BASE}/api/classes/${encodeURIComponent(classId)}/students?format=columnar`,
     {
       method: "GET",
     }
@@ -167,8 +272,8 @@ export async function getClassStudents(
   }
 
   const data = await res.json();
-  // backend returns { rows, data: [...] }
-  return (data.data ?? []) as StudentRow[];
+  // backend returns { rows, data: { columns, values } }
+  return fromColumnar<StudentRow>(data.data ?? []);
 }
 
 /* ---------- Unmatched rows ---------- */
@@ -177,7 +282,7 @@ export async function getUnmatched(): Promise<{
   rows: number;
   data: AttendanceRow[];
 }> {
-  const res = await fetch(`${API_BASE}/api/unmatched`, {
+  const res = await fetch(`${API_BASE}/api/unmatched?format=columnar`, {
     method: "GET",
   });
 
@@ -186,7 +291,98 @@ export async function getUnmatched(): Promise<{
     throw new Error(`getUnmatched failed: ${res.status} ${text}`);
   }
 
-  return res.json();
+  const data = await res.json();
+  return { rows: data.rows, data: fromColumnar<AttendanceRow>(data.data ?? []) };
+}
+
+/* ---------- Student typeahead search ---------- */
+
+export type StudentSearchHit = {
+  student_id: string;
+  name: string;
+  email: string;
+  phone: string;
+  class_id: string;
+};
+
+export async function searchStudents(
+  q: string,
+  classId?: string,
+  limit = 20
+): Promise<StudentSearchHit[]> {
+  const params = new URLSearchParams({ q, limit: String(limit) });
+  if (classId) params.set("class_id", classId);
+
+  const res = await fetch(`${API_BASE}/api/students/search?${params}`, {
+    method: "GET",
+  });
+
+  if (!res.ok) {
+    const text = await res.text();
+    throw new Error(`searchStudents failed: ${res.status} ${text}`);
+  }
+
+  const data = await res.json();
+  return (data.data ?? []) as StudentSearchHit[];
+}
+
+/* ---------- Companies ---------- */
+
+export type CompanyStats = {
+  events: number;
+  placement_events: number;
+  offers: number;
+  selection_rate: number | null;
+  avg_lpa: number | null;
+  min_lpa: number | null;
+  max_lpa: number | null;
+  lpa_distribution: Record<string, number>; // bucket ("4_6") -> offers
+};
+
+export type CompanySummary = CompanyStats & {
+  company_id: string;
+  company: string;
+  years: number[];
+};
+
+export type CompanyDetail = CompanyStats & {
+  company_id: string;
+  company: string;
+  aliases: string[];
+  year: number | null;
+  by_year: (CompanyStats & { year: number | null })[];
+  by_class: (CompanyStats & { class_id: string })[];
+};
+
+export async function getCompanies(year?: number): Promise<CompanySummary[]> {
+  const params = year ? `?year=${year}` : "";
+  const res = await fetch(`${API_BASE}/api/companies${params}`, { method: "GET" });
+
+  if (!res.ok) {
+    const text = await res.text();
+    throw new Error(`getCompanies failed: ${res.status} ${text}`);
+  }
+
+  const data = await res.json();
+  return (data.data ?? []) as CompanySummary[];
+}
+
+export async function getCompany(
+  companyId: string,
+  year?: number
+): Promise<CompanyDetail> {
+  const params = year ? `?year=${year}` : "";
+  const res = await fetch(
+    `${API_BASE}/api/companies/${encodeURIComponent(companyId)}${params}`,
+    { method: "GET" }
+  );
+
+  if (!res.ok) {
+    const text = await res.text();
+    throw new Error(`getCompany failed: ${res.status} ${text}`);
+  }
+
+  return (await res.json()) as CompanyDetail;
 }
 
 /* ---------- Resolve match ---------- */
@@ -256,3 +452,64 @@ export async function getStudentProfile(
 
   return res.json();
 }
+
+/* ---------- Change feed (server-sent events) ---------- */
+
+export type DataChange =
+  | {
+      type: "attendance_added";
+      rows: number;
+      unmatched_count: number;
+      unmatched_truncated: boolean;
+      unmatched_rows: AttendanceRow[];
+      epoch: string;
+      class_versions: Record<string, number>;
+    }
+  | {
+      type: "attendance_resolved";
+      attendance_id: string;
+      row: AttendanceRow;
+      epoch: string;
+      class_versions: Record<string, number>;
+    }
+  | {
+      type: "attendance_rematched";
+      rows: number;
+      epoch: string;
+      class_versions: Record<string, number>;
+    }
+  // reconnected (maybe to another worker / a restarted server) or
+  // missed too much: refetch everything
+  | { type: "reset" };
+
+export function subscribeChanges(
+  onChange: (event: DataChange) => void
+): () => void {
+  const source = new EventSource(`${API_BASE}/api/changes`);
+  let connected = false;
+
+  // feed state is per server worker, and changes made while we were
+  // disconnected (or through another worker) are not replayed: refetch
+  // on every reconnect
+  source.addEventListener("hello", () => {
+    if (connected) {
+      onChange({ type: "reset" });
+    }
+    connected = true;
+  });
+
+  source.addEventListener("reset", () => onChange({ type: "reset" }));
+
+  for (const type of [
+    "attendance_added",
+    "attendance_resolved",
+    "attendance_rematched",
+  ] as const) {
+    source.addEventListener(type, (e) => {
+      const data = JSON.parse((e as MessageEvent).data);
+      onChange({ type, ...data } as DataChange);
+    });
+  }
+
+  return () => source.close();
+}
@@ -1,13 +1,14 @@
 // ⬆️ very top of src/pages/ClassDetailPage.tsx
 
 import { useParams, Link } from "react-router-dom";
-import { useState, useEffect, ChangeEvent } from "react";
+import { useState, useEffect, useRef, ChangeEvent } from "react";
 import {
   uploadEventsCsv,
   resolveMatch,
   getUnmatched,
   getClassSummary,
   getClassStudents,
+  subscribeChanges,
   type AttendanceRow,
   type UploadEventsResponse,
   type ClassSummary,
@@ -612,6 +613,15 @@ function EventsTab({
 
 
 /** ===== Unmatched Tab ===== */
+
+// merge rows into the queue by attendance_id (incoming rows win)
+function mergeRows(rows: AttendanceRow[], incoming: AttendanceRow[]): AttendanceRow[] {
+  const byId = new Map(incoming.map((r) => [r.attendance_id, r]));
+  const merged = rows.map((r) => byId.get(r.attendance_id) ?? r);
+  const known = new Set(rows.map((r) => r.attendance_id));
+  return [...merged, ...incoming.filter((r) => !known.has(r.attendance_id))];
+}
+
 function UnmatchedTab({ classId }: { classId: string }) {
   const [unmatchedRows, setUnmatchedRows] = useState<AttendanceRow[]>([]);
   const [attendanceIdInput, setAttendanceIdInput] = useState("");
@@ -620,17 +630,25 @@ function UnmatchedTab({ classId }: { classId: string }) {
   const [loadingList, setLoadingList] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [success, setSuccess] = useState<string | null>(null);
+  // feed deltas seen while a fetch is in flight; the response may
+  // predate them, so they are re-applied on top of it
+  const inFlight = useRef<{ added: AttendanceRow[]; resolved: Set<string> } | null>(null);
 
   const fetchUnmatched = async () => {
+    const deltas = { added: [] as AttendanceRow[], resolved: new Set<string>() };
+    inFlight.current = deltas;
     try {
       setLoadingList(true);
       setError(null);
       const res = await getUnmatched();
-      setUnmatchedRows((res.data || []) as AttendanceRow[]);
+      if (inFlight.current !== deltas) return; // a newer fetch took over
+      const fetched = mergeRows((res.data || []) as AttendanceRow[], deltas.added);
+      setUnmatchedRows(fetched.filter((r) => !deltas.resolved.has(r.attendance_id)));
     } catch (err: any) {
       console.error(err);
       setError(err.message || "Failed to load unmatched rows");
     } finally {
+      if (inFlight.current === deltas) inFlight.current = null;
       setLoadingList(false);
     }
   };
@@ -639,6 +657,27 @@ function UnmatchedTab({ classId }: { classId: string }) {
     fetchUnmatched();
   }, [classId]);
 
+  // apply change-feed deltas instead of re-downloading the queue
+  useEffect(() => {
+    return subscribeChanges((change) => {
+      if (change.type === "attendance_added") {
+        if (change.unmatched_truncated) {
+          fetchUnmatched();
+        } else if (change.unmatched_rows.length > 0) {
+          inFlight.current?.added.push(...change.unmatched_rows);
+          setUnmatchedRows((rows) => mergeRows(rows, change.unmatched_rows));
+        }
+      } else if (change.type === "attendance_resolved") {
+        inFlight.current?.resolved.add(change.attendance_id);
+        setUnmatchedRows((rows) =>
+          rows.filter((r) => r.attendance_id !== change.attendance_id)
+        );
+      } else {
+        fetchUnmatched();
+      }
+    });
+  }, []);
+
   const handleResolve = async () => {
     setError(null);
     setSuccess(null);
@@ -651,10 +690,12 @@ function UnmatchedTab({ classId }: { classId: string }) {
     try {
       setLoadingResolve(true);
       await resolveMatch(attendanceIdInput, studentIdInput);
-      setSuccess("Match resolved. List refreshed.");
+      setSuccess("Match resolved.");
+      setUnmatchedRows((rows) =>
+        rows.filter((r) => r.attendance_id !== attendanceIdInput)
+      );
       setAttendanceIdInput("");
       setStudentIdInput("");
-      await fetchUnmatched();
     } catch (err: any) {
       console.error(err);
       setError(err.message || "Resolve match failed");
@@ -772,6 +813,7 @@ function UnmatchedTab({ classId }: { classId: string }) {
 /** ===== Summary Tab ===== */
 function SummaryTab({ classId }: { classId: string }) {
   const [summary, setSummary] = useState<ClassSummary | null>(null);
+  const summaryVersion = useRef<{ version: number; epoch?: string } | null>(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
@@ -780,6 +822,7 @@ function SummaryTab({ classId }: { classId: string }) {
       setLoading(true);
       setError(null);
       const data = (await getClassSummary(classId)) as ClassSummary;
+      summaryVersion.current = { version: data.version ?? 0, epoch: data.epoch };
       setSummary(data);
     } catch (err: any) {
       console.error(err);
@@ -793,6 +836,23 @@ function SummaryTab({ classId }: { classId: string }) {
     fetchSummary();
   }, [classId]);
 
+  // refetch only when this class's aggregates got a newer version;
+  // versions from another server worker (epoch) can't be compared
+  useEffect(() => {
+    return subscribeChanges((change) => {
+      if (change.type === "reset") {
+        fetchSummary();
+        return;
+      }
+      const version = change.class_versions[classId];
+      if (version === undefined) return;
+      const current = summaryVersion.current;
+      if (!current || current.epoch !== change.epoch || version > current.version) {
+        fetchSummary();
+      }
+    });
+  }, [classId]);
+
   return (
     <div className="bg-slate-800 border border-slate-700 rounded-xl p-4 text-sm space-y-4">
       <h3 className="font-semibold mb-2">Summary</h3>
@@ -0,0 +1,141 @@
+import pandas as pd
+import pytest
+
+from app import class_summary, companies, trends
+from app.companies import build_company_stats, load_company_stats
+from app.ingest_journal import JOURNAL
+from app.trends import build_rollups, load_rollups
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    """
+    The shared JOURNAL and the derived stores, pointed at a temp dir.
+    """
+    monkeypatch.setattr(JOURNAL, "log_path", tmp_path / "attendance_log.csv")
+    monkeypatch.setattr(JOURNAL, "journal_path", tmp_path / "attendance_journal.jsonl")
+    monkeypatch.setattr(JOURNAL, "lock_path", tmp_path / "attendance_journal.lock")
+    monkeypatch.setattr(class_summary, "LOG_PATH", JOURNAL.log_path)
+    monkeypatch.setattr(trends, "ROLLUP_PATH", tmp_path / "trends_rollup.csv")
+    monkeypatch.setattr(companies, "STATS_PATH", tmp_path / "company_stats.csv")
+    monkeypatch.setattr(companies, "ALIASES_PATH", tmp_path / "company_aliases.csv")
+    JOURNAL.base = None
+    JOURNAL._reset()
+
+    # committed log of one row, derived stores built from it
+    rows(["SeedCo"]).to_csv(JOURNAL.log_path, index=False)
+    load_rollups()
+    load_company_stats()
+    yield JOURNAL
+    JOURNAL.base = None
+    JOURNAL._reset()
+
+
+def rows(companies_: list[str], tag: str = "") -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "attendance_id": [f"{tag}{c}-{i}" for i, c in enumerate(companies_)],
+            "fingerprint_hash": [f"fp-{tag}{c}-{i}" for i, c in enumerate(companies_)],
+            "student_id": "STU0001",
+            "class_id": "CSE-A-2025",
+            "event_type": "Placement",
+            "event_date": "2025-03-10",
+            "company": companies_,
+            "result": "Selected",
+            "lpa": 8.0,
+            "matched": True,
+        }
+    )
+
+
+def rollup_companies() -> set[str]:
+    stored = load_rollups()
+    return set(stored.loc[stored["dimension"] == "company", "key"])
+
+
+def expected_companies(journal) -> set[str]:
+    built = build_rollups(journal.view())
+    return set(built.loc[built["dimension"] == "company", "key"])
+
+
+def test_append_updates_derived_stores(journal):
+    class_summary.save_attendance_log(rows(["OkCo"]))
+
+    assert journal.underived_entries() == 0
+    assert rollup_companies() == {"SeedCo", "OkCo"}
+    assert load_company_stats()["events"].sum() == 2
+
+
+def test_failed_update_is_not_hidden_by_next_write(journal, monkeypatch):
+    def fail(_):
+        raise RuntimeError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(class_summary, "update_rollups", fail)
+        class_summary.save_attendance_log(rows(["FailCo"]))
+    assert journal.underived_entries() == 1
+
+    class_summary.save_attendance_log(rows(["OkCo"]))
+    assert journal.underived_entries() == 0
+    assert rollup_companies() == expected_companies(journal) == {"SeedCo", "FailCo", "OkCo"}
+    assert load_company_stats()["events"].sum() == build_company_stats(journal.view())["events"].sum() == 3
+
+    journal.commit()
+    assert rollup_companies() == {"SeedCo", "FailCo", "OkCo"}
+
+
+def test_commit_rebuilds_unmarked_entries(journal):
+    # journaled by a writer that died before updating the stores
+    journal.append(rows(["LostCo"]))
+    assert rollup_companies() == {"SeedCo"}
+
+    assert journal.commit() == 1
+    assert rollup_companies() == {"SeedCo", "LostCo"}
+    assert load_company_stats()["events"].sum() == 2
+
+
+def test_replay_rebuilds_derived_stores(journal):
+    class_summary.save_attendance_log(rows(["OkCo"]))
+    # derived files lost / stale after a crash
+    trends.save_rollups(trends._empty_rollups())
+
+    journal.base = None
+    assert journal.replay() == 1
+    assert journal.journal_path.stat().st_size == 0
+    assert rollup_companies() == {"SeedCo", "OkCo"}
+    assert set(pd.read_csv(journal.log_path)["company"]) == {"SeedCo", "OkCo"}
+
+
+def test_replay_drops_torn_tail(journal):
+    class_summary.save_attendance_log(rows(["OkCo"]))
+    with open(journal.journal_path, "ab") as fh:
+        fh.write(b'{"op": "append", "rows": [{"attendance_id": "torn"')
+
+    journal.base = None
+    assert journal.replay() == 1
+    log = pd.read_csv(journal.log_path)
+    assert "torn" not in set(log["attendance_id"])
+    assert journal.journal_path.stat().st_size == 0
+
+
+def test_replayed_entries_are_idempotent(journal):
+    class_summary.save_attendance_log(rows(["OkCo"]))
+    journaled = journal.journal_path.read_bytes()
+    journal.commit()
+
+    # crash between the CSV rename and the journal truncate
+    journal.journal_path.write_bytes(journaled)
+    journal.base = None
+    journal.replay()
+    assert len(pd.read_csv(journal.log_path)) == 2
+
+
+def test_update_refreshes_touched_buckets(journal):
+    class_summary.save_attendance_log(rows(["OkCo"]))
+    edited = journal.view().iloc[[1]].copy()
+    edited["company"] = "MovedCo"
+    class_summary.update_attendance_rows(edited)
+
+    assert rollup_companies() == expected_companies(journal) == {"SeedCo", "MovedCo"}
+    stats = load_company_stats()
+    assert set(stats["company"]) == {"SeedCo", "MovedCo"}
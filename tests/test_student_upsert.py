@@ -0,0 +1,66 @@
+import pandas as pd
+
+from app.class_summary import generate_attendance_log_from_df, parse_log_types
+from app.matching import build_lookup
+from app.student_upsert import diff_students, rematch_affected
+
+MASTER = pd.DataFrame(
+    {
+        "student_id": ["STU0001"],
+        "name": ["Asha Rao"],
+        "email": ["asha@example.com"],
+        "phone": ["9000000009"],
+        "class_id": ["CSE-A-2025"],
+    }
+)
+
+
+def events(phones: list) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "student_id": [None] * len(phones),
+            "name": [f"Walk-in {i}" for i in range(len(phones))],
+            "email": [None] * len(phones),
+            "phone": phones,
+            "company_or_organizer": "Infosys",
+            "event_type": "Placement",
+            "event_date": "2025-03-10",
+            "result": "Selected",
+        }
+    )
+
+
+def test_phone_rematch_after_csv_round_trip(tmp_path):
+    # a blank phone makes pandas read the column as float64
+    log_df = generate_attendance_log_from_df(events([9000000001, None]), build_lookup(MASTER))
+    assert log_df.at[0, "input_phone"] == "9000000001"
+    assert pd.isna(log_df.at[1, "input_phone"])
+    assert not log_df["matched"].any()
+
+    path = tmp_path / "attendance_log.csv"
+    log_df.to_csv(path, index=False)
+    log_df = parse_log_types(pd.read_csv(path))
+    assert log_df.at[0, "input_phone"] == "9000000001"
+
+    new_master = pd.concat(
+        [
+            MASTER,
+            pd.DataFrame(
+                {
+                    "student_id": ["STU0002"],
+                    "name": ["Ravi Kumar"],
+                    "email": ["ravi@example.com"],
+                    "phone": [9000000001.0],
+                    "class_id": ["CSE-B-2025"],
+                }
+            ),
+        ],
+        ignore_index=True,
+    )
+    diff = diff_students(MASTER, new_master)
+    assert diff["inserted"] == ["STU0002"] and diff["updated"] == []
+
+    log_df, stats = rematch_affected(log_df, diff)
+    assert stats["candidates"] == 1 and stats["rematched"] == 1
+    assert log_df.at[0, "student_id"] == "STU0002"
+    assert log_df.at[0, "match_status"] == "MATCHED_BY_PHONE"